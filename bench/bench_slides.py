@@ -0,0 +1,40 @@
+"""Compara diapositivas por segundo entre la construcción forma por forma y la plantilla clonada.
+
+    python -m bench.bench_slides --rows 500
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from bench.cohort import deck_frame
+from slides import new_presentation, create_slide_from_row, create_presentation_from_dataframe
+
+
+def legacy(df, path):
+    prs = new_presentation()
+    for _, row in df.iterrows():
+        create_slide_from_row(prs, row)
+    prs.save(path)
+
+
+def measure(label, build, df, path):
+    start = time.perf_counter()
+    build(df, path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed:8.2f}s {len(df) / elapsed:10.1f} diapositivas/s {os.path.getsize(path) / 1024:10.0f} KB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    df = deck_frame(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        measure("forma por forma", legacy, df, os.path.join(tmp, "legacy.pptx"))
+        measure("plantilla", create_presentation_from_dataframe, df, os.path.join(tmp, "template.pptx"))
+
+
+if __name__ == "__main__":
+    main()
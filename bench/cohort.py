@@ -0,0 +1,145 @@
+"""Cohortes sintéticas: un ZIP con una carpeta por RUT y el Excel de estudiantes correspondiente.
+
+    python -m bench.cohort --students 100 --out /tmp/cohorte
+"""
+import io
+import os
+import random
+import zipfile
+import argparse
+
+import fitz  # PyMuPDF
+import pandas as pd
+from PIL import Image as PILImage, ImageDraw
+
+from propuestas import COLUMNAS_PROPUESTA
+
+CARRERAS = ["Ingeniería Civil", "Enfermería", "Derecho", "Psicología", "Arquitectura"]
+SEDES = ["Santiago", "Concepción", "Viña del Mar"]
+MOTIVOS = ["Situación económica familiar", "Enfermedad del estudiante", "Cesantía del apoderado",
+           "Fallecimiento de un familiar"]
+DOCUMENTOS = ["Certificado médico", "Finiquito laboral", "Carta de solicitud", "Liquidación de sueldo",
+              "Certificado de defunción", "Cédula de identidad"]
+
+LOREM = ("Por medio de la presente, solicito a la comisión la revisión de mi situación académica y económica. "
+         "Durante el último semestre mi grupo familiar ha enfrentado dificultades que afectan el pago del arancel. "
+         "Adjunto los antecedentes que respaldan esta solicitud y quedo atento a cualquier requerimiento adicional. ")
+
+
+def rut(number):
+    # Dígito verificador módulo 11
+    total, factor = 0, 2
+    for digit in reversed(str(number)):
+        total += int(digit) * factor
+        factor = 2 if factor == 7 else factor + 1
+    dv = 11 - total % 11
+    return f"{number}-{'0' if dv == 11 else 'K' if dv == 10 else dv}"
+
+
+def student_rows(n, seed=0):
+    # Columnas que leen merge_analysis_with_excel, construir_prompt, las reglas y create_slide_from_row
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        rows.append({
+            'RUT:': rut(15000000 + i * 7919),
+            'Nombre completo': f"Estudiante Sintético {i}",
+            'Carrera': rng.choice(CARRERAS),
+            'Sede': rng.choice(SEDES),
+            'Vigencia con cursos inscritos': rng.choice(["Sí", "No"]),
+            'Año y Semestre de ingreso': f"{rng.randint(2018, 2023)}-{rng.randint(1, 2)}",
+            'Hora de inicio': f"2024-03-{rng.randint(1, 28):02d} {rng.randint(8, 20):02d}:00",
+            'Motivo solicitud.': rng.choice(MOTIVOS),
+            '¿Ha recibido beneficios anteriormente? ¿Cuál?': rng.choice(["No", "Beca de arancel", "Gratuidad"]),
+            'Última fecha en que se entregó el Beneficio': f"{rng.randint(2019, 2023)}-{rng.randint(1, 2)}",
+            'Deuda vencida en sistema': float(rng.choice([0, 0, 150000, 420000, 980000])),
+            'Monto cuota de Arancel': float(rng.randint(200, 450) * 1000),
+            'Monto valor de matrícula': float(rng.randint(120, 200) * 1000),
+            'Avance curricular (%)': rng.randint(10, 95),
+            'PPS': round(rng.uniform(4.0, 6.5), 1),
+            'Registro Social de Hogares (RSH) o Nivel Socioeconómico (NSE)': rng.choice(["40%", "60%", "80%", "90%"]),
+            'PPE': round(rng.uniform(0.3, 1.0), 2),
+            'Plan de Retención': float(rng.randint(0, 5) * 50000),
+        })
+    return rows
+
+
+def deck_frame(n, seed=0):
+    # Filas con análisis y propuesta, listas para create_presentation_from_dataframe
+    rng = random.Random(seed)
+    df = pd.DataFrame(student_rows(n, seed)).rename(columns={'RUT:': 'Folder'})
+    df['Análisis_concatenado'] = [f"Postulación FUAS: {rng.choice(['Sí', 'No'])}. {LOREM}" for _ in range(n)]
+    df[COLUMNAS_PROPUESTA[0]] = [rng.choice(["Aprobada", "Rechazada"]) for _ in range(n)]
+    df[COLUMNAS_PROPUESTA[1]] = "Se aprueba la solicitud por la situación acreditada."
+    df[COLUMNAS_PROPUESTA[2]] = "50%"
+    df[COLUMNAS_PROPUESTA[3]] = "Cesantía del apoderado\nGastos médicos"
+    df[COLUMNAS_PROPUESTA[4]] = "Finiquito\nCertificado médico"
+    return df
+
+
+def scanned_image(title, lines, rng, size=(1240, 1754)):
+    # Página "escaneada": texto dibujado sobre fondo con ruido, como JPEG
+    img = PILImage.effect_noise(size, 12).point(lambda v: 235 + v % 20).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    draw.text((120, 120), title, fill=(20, 20, 20))
+    y = 220
+    for line in lines:
+        draw.text((120, y), line, fill=(40, 40, 40))
+        y += 40
+    if rng.random() < 0.5:
+        draw.ellipse((900, 1400, 1100, 1600), outline=(30, 60, 160), width=6)  # timbre
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def make_pdf(title, pages, scanned_ratio, rng):
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page(width=595, height=842)
+        if rng.random() < scanned_ratio:
+            lines = [f"{rng.choice(DOCUMENTOS)} — página {number + 1}"] + LOREM.split(". ")
+            page.insert_image(page.rect, stream=scanned_image(title, lines, rng))
+        else:
+            page.insert_textbox(fitz.Rect(50, 50, 545, 792), f"{title}\n\n{LOREM * 3}", fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def generate_cohort(out_dir, students, pdfs_per_student=2, pages_per_pdf=2, scanned_ratio=0.5, seed=0):
+    """Escribe `cohorte.zip` y `estudiantes.xlsx` en `out_dir` y devuelve sus rutas."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    rows = student_rows(students, seed)
+
+    zip_path = os.path.join(out_dir, "cohorte.zip")
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for row in rows:
+            for i in range(pdfs_per_student):
+                name = rng.choice(DOCUMENTOS)
+                pdf = make_pdf(f"{name} — {row['Nombre completo']}", pages_per_pdf, scanned_ratio, rng)
+                zip_ref.writestr(f"cohorte/{row['RUT:']}/documento_{i + 1}.pdf", pdf)
+
+    excel_path = os.path.join(out_dir, "estudiantes.xlsx")
+    pd.DataFrame(rows).to_excel(excel_path, index=False)
+    return zip_path, excel_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=10)
+    parser.add_argument("--pdfs", type=int, default=2, help="PDFs por estudiante")
+    parser.add_argument("--pages", type=int, default=2, help="Páginas por PDF")
+    parser.add_argument("--scanned-ratio", type=float, default=0.5, help="Fracción de páginas escaneadas")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+
+    zip_path, excel_path = generate_cohort(args.out, args.students, args.pdfs, args.pages, args.scanned_ratio, args.seed)
+    print(zip_path)
+    print(excel_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Escenarios de rendimiento sin red: análisis de PDFs, propuestas y presentación.
+
+    python -m bench.scenarios --sizes 10 100 1000 --latency 0.2 --json bench_output.json
+
+Cada escenario corre en un proceso nuevo para medir su pico de memoria
+(RSS) por separado; las solicitudes se cuentan en el servidor de prueba.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from bench.cohort import generate_cohort, deck_frame, LOREM
+from bench.stub_server import StubServer
+
+SCENARIOS = ['vision', 'proposals', 'slides']
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _vision(paths, url, options):
+    from pipeline import process_pdfs_in_zip
+    results = process_pdfs_in_zip(paths['zip'], "bench", endpoint=f"{url}/chat/completions")
+    return {"rows": len(results)}
+
+
+def _proposals(paths, url, options):
+    from openai import OpenAI
+    from pipeline import read_students_excel, generar_propuesta_resolucion
+    df = read_students_excel(paths['excel'])
+    df['Análisis_concatenado'] = f"Postulación FUAS: Sí. {LOREM}"
+    propuestas = generar_propuesta_resolucion(df, OpenAI(api_key="bench", base_url=url))
+    return {"rows": len(propuestas)}
+
+
+def _slides(paths, url, options):
+    from slides import create_presentation_from_dataframe
+    df = deck_frame(options['students'])
+    create_presentation_from_dataframe(df, os.path.join(paths['dir'], "bench.pptx"))
+    return {"rows": len(df)}
+
+
+def run_scenario(name, paths, url, options):
+    # Corre en un proceso hijo: la salida del pipeline se descarta para no mezclarla con el reporte
+    target = {'vision': _vision, 'proposals': _proposals, 'slides': _slides}[name]
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        result = target(paths, url, options)
+    result.update(wall_seconds=round(time.perf_counter() - started, 3), peak_rss_mb=peak_rss_mb())
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Estudiantes por cohorte")
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--pdfs", type=int, default=2, help="PDFs por estudiante")
+    parser.add_argument("--pages", type=int, default=2, help="Páginas por PDF")
+    parser.add_argument("--scanned-ratio", type=float, default=0.5)
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia media del servidor de prueba")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rps", type=float, default=200.0, help="VISION_RPS para las corridas")
+    parser.add_argument("--json", help="Archivo donde guardar los resultados")
+    args = parser.parse_args(argv)
+
+    # Los procesos hijos heredan este entorno; nada se lee ni escribe en la caché real
+    work_dir = tempfile.mkdtemp(prefix="revdoc-bench-")
+    os.environ['REVDOC_CACHE_DIR'] = os.path.join(work_dir, "cache")
+    os.environ['VISION_RPS'] = str(args.rps)
+    os.environ.setdefault('OPENAI_API_KEY', "bench")
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with StubServer(latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate) as server:
+        for students in args.sizes:
+            cohort_dir = os.path.join(work_dir, f"cohorte_{students}")
+            started = time.perf_counter()
+            zip_path, excel_path = generate_cohort(cohort_dir, students, args.pdfs, args.pages, args.scanned_ratio)
+            print(f"Cohorte de {students} estudiantes generada en {time.perf_counter() - started:.1f} s")
+            paths = {'dir': cohort_dir, 'zip': zip_path, 'excel': excel_path}
+            options = {'students': students}
+
+            for name in args.scenarios:
+                before = server.snapshot()
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(run_scenario, name, paths, server.url, options).result()
+                after = server.snapshot()
+                result.update(scenario=name, students=students,
+                              requests=after['requests'] - before['requests'],
+                              rate_limited=after['rate_limited'] - before['rate_limited'],
+                              errors=after['errors'] - before['errors'])
+                results.append(result)
+                rss = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else "n/d"
+                print(f"{name:<10} {students:>6} estudiantes {result['wall_seconds']:>9.2f} s "
+                      f"RSS {rss:>8} {result['requests']:>7} solicitudes ({result['rate_limited']} 429, "
+                      f"{result['errors']} 500)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
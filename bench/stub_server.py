@@ -0,0 +1,185 @@
+"""Servidor local compatible con /chat/completions para medir sin llamar a la API real.
+
+    python -m bench.stub_server --port 8765 --latency 0.2 --error-rate 0.01 --rate-limit-rate 0.02
+
+Responde según el tipo de solicitud: análisis en texto plano, lotes de
+imágenes como {"paginas": [...]} y propuestas con el esquema JSON pedido.
+La latencia, los errores 500 y los 429 (con Retry-After) son configurables.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANALYSIS = ("- Tipo de documento: Certificado médico\n- Nombres completos: Estudiante Sintético\n"
+            "- Fechas relevantes: 2024-03-01\n- Institución emisora: Clínica Central\n"
+            "- Diagnóstico médico: Reposo por 30 días\n- Firmas y sellos presentes: Sí")
+
+
+def _proposal(messages):
+    # Decisión estable por contenido del prompt, para que las corridas sean comparables
+    prompt = messages[-1]["content"] if messages else ""
+    approved = sum(prompt.encode()) % 3 != 0
+    return json.dumps({
+        "propuesta_resolucion": "Aprobada" if approved else "Rechazada",
+        "resolucion": "Se acoge la solicitud por la situación acreditada." if approved else "No se acredita la situación.",
+        "monto_beca": "50%" if approved else "No aplica",
+        "motivo_caso": "Cesantía del apoderado",
+        "documentos": "Certificado médico, finiquito",
+    }, ensure_ascii=False)
+
+
+def fake_completion(payload):
+    messages = payload.get("messages", [])
+    response_format = (payload.get("response_format") or {}).get("type")
+    if response_format == "json_schema":
+        content = _proposal(messages)
+    elif response_format == "json_object":
+        parts = messages[0]["content"] if messages and isinstance(messages[0]["content"], list) else []
+        images = sum(1 for part in parts if part.get("type") == "image_url")
+        content = json.dumps({"paginas": [{"pagina": i + 1, "analisis": ANALYSIS} for i in range(images)]},
+                             ensure_ascii=False)
+    else:
+        content = ANALYSIS
+
+    # Estimación gruesa: unos 4 caracteres por token; una imagen cuenta como 85 tokens (detail low)
+    prompt_chars = 0
+    for message in messages:
+        parts = message["content"] if isinstance(message["content"], list) else [{"type": "text", "text": message["content"]}]
+        prompt_chars += sum(len(part.get("text", "")) if part.get("type") == "text" else 340 for part in parts)
+    usage = {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "stub"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": usage,
+    }
+
+
+class StubServer:
+    """Servidor en un hilo de fondo; `url` es la base para OPENAI_BASE_URL o `base_url`."""
+
+    def __init__(self, port=0, latency=0.05, jitter=0.5, error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0,
+                 seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def _draw(self):
+        with self.lock:
+            roll = self.rng.random()
+            delay = self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter))
+        if roll < self.rate_limit_rate:
+            return 429, 0.0
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500, delay
+        return 200, delay
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server._count("requests")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"Ruta desconocida: {self.path}"}})
+                    return
+
+                status, delay = server._draw()
+                time.sleep(max(0.0, delay))
+                if status == 429:
+                    server._count("rate_limited")
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                               {"Retry-After": str(server.retry_after)})
+                elif status == 500:
+                    server._count("errors")
+                    self._send(500, {"error": {"message": "The server had an error", "type": "server_error"}})
+                else:
+                    server._count("ok")
+                    self._send(200, fake_completion(payload))
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Latencia media por solicitud, en segundos")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Variación relativa de la latencia")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Segundos del encabezado Retry-After")
+    args = parser.parse_args(argv)
+
+    server = StubServer(args.port, args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.retry_after)
+    print(f"Servidor de prueba en {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.snapshot()))
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
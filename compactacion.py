@@ -0,0 +1,243 @@
+import re
+import threading
+
+from cache import cache_key
+from dedup import estimate_tokens, collapse_repeats
+from metrics import RunMetrics
+from vision import ANALYSIS_FAILED
+
+MODELO_RESUMEN = "gpt-4o-mini"
+
+# Campos que pide el prompt de visión, en el orden de importancia para la propuesta
+CAMPOS = {
+    'tipo': "Tipo de documento",
+    'resumen': "Resumen de la carta",
+    'diagnostico': "Diagnóstico médico",
+    'institucion': "Institución emisora",
+    'fechas': "Fechas relevantes",
+    'nombres': "Nombres completos",
+    'firmas': "Firmas y sellos",
+}
+
+ETIQUETA = re.compile(
+    r"[-*#\s]*\**\s*(?P<etiqueta>tipo de documento|nombres? completos?|fechas? relevantes?|instituci[oó]n emisora|"
+    r"diagn[oó]stico m[eé]dico|firmas? y sellos?(?: presentes)?|resumen de la carta)\s*\**\s*(?:\([^)]*\))?\s*\**\s*:\s*\**",
+    re.IGNORECASE)
+
+# Valores que el modelo usa para decir que un campo no aplica; deben ser el valor completo,
+# porque "No se registran ingresos formales" es un dato, no un campo vacío
+VACIO = re.compile(r"^(n/?a|ningun[oa]s?|no (aplica|disponible|especificad[oa]s?|indicad[oa]s?|visibles?|se \w+)"
+                   r"|sin (información|datos))\.?$", re.IGNORECASE)
+
+PROMPT_RESUMEN = "Resume los siguientes antecedentes de documentos de un estudiante que solicita una beca. Conserva los tipos de documento, las fechas, los montos, los diagnósticos y la situación económica, familiar o académica que se describe. Responde solo con viñetas breves, sin repetir información.\n\nAntecedentes:\n"
+
+
+def _campo(etiqueta):
+    etiqueta = etiqueta.lower()
+    for prefijo, campo in (('tipo', 'tipo'), ('nombre', 'nombres'), ('fecha', 'fechas'), ('instituci', 'institucion'),
+                           ('diagn', 'diagnostico'), ('firma', 'firmas'), ('resumen', 'resumen')):
+        if etiqueta.startswith(prefijo):
+            return campo
+
+
+def _limpiar(valor):
+    valor = " ".join(valor.replace("*", " ").split()).strip(" -;")
+    if not valor or VACIO.match(valor):
+        return None
+    return valor
+
+
+def parsear_analisis(texto):
+    """Separa el análisis concatenado en documentos con sus campos.
+
+    Cada "Tipo de documento" abre un documento nuevo. Devuelve
+    `(documentos, libres)`: una lista de dicts campo -> valor y los trozos
+    de texto que no pertenecen a ningún campo.
+    """
+    texto = texto.replace(ANALYSIS_FAILED, " ")
+    documentos, libres = [], []
+    actual = {}
+    coincidencias = list(ETIQUETA.finditer(texto))
+    inicio = coincidencias[0].start() if coincidencias else len(texto)
+    libre = _limpiar(texto[:inicio])
+    if libre:
+        libres.append(libre)
+
+    for i, coincidencia in enumerate(coincidencias):
+        fin = coincidencias[i + 1].start() if i + 1 < len(coincidencias) else len(texto)
+        campo = _campo(coincidencia.group('etiqueta'))
+        if campo == 'tipo' and actual:
+            documentos.append(actual)
+            actual = {}
+        valor = _limpiar(texto[coincidencia.end():fin])
+        if not valor:
+            continue
+        # Un campo que aparece varias veces en el documento (p. ej. dos fechas) conserva todos sus valores
+        anterior = actual.get(campo)
+        if anterior is None:
+            actual[campo] = valor
+        elif valor.lower() not in anterior.lower():
+            actual[campo] = f"{anterior}; {valor}"
+    if actual:
+        documentos.append(actual)
+    return documentos, libres
+
+
+def deduplicar(documentos):
+    # El mismo documento analizado varias veces (o en varias páginas) se deja una vez, completando campos
+    unicos = {}
+    for documento in documentos:
+        clave = tuple(documento.get(campo, '').lower() for campo in ('tipo', 'nombres', 'fechas', 'institucion'))
+        if clave in unicos:
+            for campo, valor in documento.items():
+                unicos[clave].setdefault(campo, valor)
+        else:
+            unicos[clave] = dict(documento)
+    return list(unicos.values())
+
+
+def elementos_priorizados(documentos, libres):
+    # (prioridad, texto): lo que más pesa en la decisión primero
+    elementos = []
+    tipos = collapse_repeats(documento['tipo'] for documento in documentos if 'tipo' in documento)
+    if tipos:
+        elementos.append((0, "Documentos presentados: " + "; ".join(tipos)))
+
+    vistos = set()
+    for documento in documentos:
+        encabezado = documento.get('tipo', "Documento")
+        for prioridad, campos in enumerate([('resumen',), ('diagnostico',), ('institucion', 'fechas'), ('nombres',),
+                                            ('firmas',)], start=1):
+            partes = []
+            for campo in campos:
+                valor = documento.get(campo)
+                if not valor:
+                    continue
+                # Un mismo resumen o diagnóstico repetido en varios documentos se incluye una vez;
+                # fechas, emisores y nombres se repiten legítimamente entre documentos distintos
+                if campo in ('resumen', 'diagnostico'):
+                    if (campo, valor.lower()) in vistos:
+                        continue
+                    vistos.add((campo, valor.lower()))
+                partes.append(f"{CAMPOS[campo]}: {valor}")
+            if partes:
+                elementos.append((prioridad, f"{encabezado} — " + "; ".join(partes)))
+
+    for libre in collapse_repeats(libres):
+        elementos.append((6, libre))
+    return elementos
+
+
+def ajustar_a_presupuesto(elementos, presupuesto):
+    """Elige elementos por prioridad mientras quepan; devuelve (texto, omitidos)."""
+    orden = sorted(range(len(elementos)), key=lambda i: (elementos[i][0], i))
+    elegidos, omitidos, usados = [], [], 0
+    for i in orden:
+        prioridad, texto = elementos[i]
+        tokens = estimate_tokens(texto) + 1
+        if usados + tokens <= presupuesto:
+            elegidos.append(texto)
+            usados += tokens
+        else:
+            omitidos.append(elementos[i])
+    return "\n".join(elegidos), omitidos
+
+
+class Compactador:
+    """Reduce Análisis_concatenado a un presupuesto de tokens antes del prompt de propuestas.
+
+    El texto que ya cabe en el presupuesto no se toca. Si no, primero
+    interpreta los campos de cada página, quita documentos y valores
+    repetidos y ordena lo que queda por importancia; si aún así lo esencial
+    (documentos, resúmenes de cartas, diagnósticos) no cabe, resume por
+    partes con un modelo barato (map-reduce). El análisis guardado en el
+    Excel no cambia; solo el texto que va en el prompt.
+    """
+
+    def __init__(self, client=None, presupuesto=1200, modelo=MODELO_RESUMEN, cache=None, metrics=None):
+        self.client = client
+        self.presupuesto = presupuesto
+        self.modelo = modelo
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        self.tokens_antes = 0
+        self.tokens_despues = 0
+        self.resumidas = 0
+        self.llamadas = 0
+        self.lock = threading.Lock()
+
+    def _resumir(self, texto, max_tokens):
+        mensajes = [{"role": "user", "content": PROMPT_RESUMEN + texto}]
+        key = None
+        if self.cache is not None:
+            key = cache_key({"model": self.modelo, "messages": mensajes, "max_tokens": max_tokens})
+            resumen = self.cache.get(key)
+            if resumen is not None:
+                self.metrics.record_request('compaction', cache_hit=True)
+                return resumen
+
+        completion = self.client.chat.completions.create(model=self.modelo, messages=mensajes, max_tokens=max_tokens)
+        with self.lock:
+            self.llamadas += 1
+        self.metrics.record_request('compaction', usage=completion.usage)
+        resumen = (completion.choices[0].message.content or '').strip()
+        if key is not None and resumen:
+            self.cache.put(key, resumen)
+        return resumen
+
+    def _map_reduce(self, elementos):
+        # Map: trozos de a lo sumo un presupuesto; reduce: un último resumen si la unión no cabe
+        trozos, actual, usados = [], [], 0
+        for _, texto in sorted(elementos, key=lambda elemento: elemento[0]):
+            tokens = estimate_tokens(texto) + 1
+            if actual and usados + tokens > self.presupuesto:
+                trozos.append("\n".join(actual))
+                actual, usados = [], 0
+            actual.append(texto)
+            usados += tokens
+        if actual:
+            trozos.append("\n".join(actual))
+
+        por_trozo = max(64, self.presupuesto // len(trozos))
+        resumen = "\n".join(self._resumir(trozo, por_trozo) for trozo in trozos)
+        if estimate_tokens(resumen) > self.presupuesto:
+            resumen = self._resumir(resumen, self.presupuesto)
+        return resumen
+
+    def compactar(self, texto):
+        if not isinstance(texto, str) or self.presupuesto <= 0:
+            return texto
+        antes = estimate_tokens(texto)
+        if antes <= self.presupuesto:
+            # Lo que ya cabe va tal cual: reescribirlo solo puede alargarlo
+            self._registrar(antes, antes)
+            return texto
+
+        documentos, libres = parsear_analisis(texto)
+        elementos = elementos_priorizados(deduplicar(documentos), libres)
+        compacto, omitidos = ajustar_a_presupuesto(elementos, self.presupuesto)
+        # Si no se reconoció ningún campo, el texto libre es todo lo que hay
+        esenciales = [elemento for elemento in omitidos if elemento[0] <= 2 or not documentos]
+        if esenciales and self.client is not None:
+            try:
+                compacto = self._map_reduce(elementos)
+                with self.lock:
+                    self.resumidas += 1
+            except Exception:
+                # Sin resumen, queda la versión priorizada, que ya respeta el presupuesto
+                pass
+        if estimate_tokens(compacto) > self.presupuesto:
+            compacto = compacto[:self.presupuesto * 4]
+
+        despues = estimate_tokens(compacto)
+        if despues >= antes:
+            compacto, despues = texto, antes
+        self._registrar(antes, despues)
+        return compacto
+
+    def _registrar(self, antes, despues):
+        with self.lock:
+            self.tokens_antes += antes
+            self.tokens_despues += despues
+        self.metrics.add_count('analisis_tokens_antes', antes)
+        self.metrics.add_count('analisis_tokens_despues', despues)
@@ -0,0 +1,97 @@
+import os
+from dotenv import load_dotenv
+
+# Cargar variables de entorno desde .env antes de que otros módulos lean su configuración
+load_dotenv()
+
+from cache import ResultCache, CACHE_DIR  # noqa: E402
+from reglas import cargar_reglas  # noqa: E402
+from ingest import ZipLimits  # noqa: E402
+from jobs import prune_jobs  # noqa: E402
+
+# Paralelismo y límite de tasa de las llamadas de visión
+VISION_CONCURRENCY = int(os.getenv('VISION_CONCURRENCY', '8'))
+VISION_RPS = float(os.getenv('VISION_RPS', '5'))
+VISION_MAX_RETRIES = int(os.getenv('VISION_MAX_RETRIES', '5'))
+VISION_TIMEOUT = float(os.getenv('VISION_TIMEOUT', '60'))
+
+# Caché persistente de análisis de visión, compartida entre ejecuciones
+VISION_CACHE_MAX_MB = int(os.getenv('VISION_CACHE_MAX_MB', '512'))
+VISION_CACHE_TTL_DAYS = float(os.getenv('VISION_CACHE_TTL_DAYS', '30'))
+
+# Directorios de trabajo (entradas, checkpoints y salidas de cada carga): se borran los inactivos
+# por más de JOB_TTL_DAYS y, si en total superan JOB_MAX_MB, los menos recientes
+JOB_TTL_DAYS = float(os.getenv('JOB_TTL_DAYS', '7'))
+JOB_MAX_MB = int(os.getenv('JOB_MAX_MB', '10240'))
+
+# Generación de propuestas: concurrencia, reintentos y caché por prompt
+PROPUESTA_CONCURRENCY = int(os.getenv('PROPUESTA_CONCURRENCY', '8'))
+PROPUESTA_MAX_RETRIES = int(os.getenv('PROPUESTA_MAX_RETRIES', '5'))
+PROPUESTA_TIMEOUT = float(os.getenv('PROPUESTA_TIMEOUT', '120'))
+
+# Reglas deterministas previas al modelo (archivo JSON opcional; vacío usa las del prompt)
+PROPUESTA_REGLAS = cargar_reglas(os.getenv('PROPUESTA_REGLAS_PATH'))
+
+# Presupuesto de tokens de Análisis_concatenado en cada prompt de propuesta (0 lo desactiva)
+# y modelo barato para resumir cuando lo esencial no cabe
+PROPUESTA_ANALISIS_MAX_TOKENS = int(os.getenv('PROPUESTA_ANALISIS_MAX_TOKENS', '1200'))
+COMPACTACION_MODELO = os.getenv('COMPACTACION_MODELO', 'gpt-4o-mini')
+
+# Formato, calidad y resolución de las páginas enviadas al modelo de visión
+RENDER_FORMAT = os.getenv('RENDER_FORMAT', 'png')
+RENDER_QUALITY = int(os.getenv('RENDER_QUALITY', '85'))
+RENDER_DPI = int(os.getenv('RENDER_DPI', '72'))
+
+# Presupuesto por página para el optimizador de payload (0 lo desactiva)
+PAYLOAD_MAX_KB = int(os.getenv('PAYLOAD_MAX_KB', '350'))
+PAYLOAD_MAX_PIXELS = int(os.getenv('PAYLOAD_MAX_PIXELS', '2000000'))
+PAYLOAD_CROP_MARGINS = os.getenv('PAYLOAD_CROP_MARGINS', '1') == '1'
+# "Bytes antes" de cada página: por defecto, su primera codificación en la escalera de DPI y calidad;
+# con 1 se renderiza otra vez en PNG a 72 dpi, como antes del optimizador (lento)
+PAYLOAD_MEASURE_BASELINE = os.getenv('PAYLOAD_MEASURE_BASELINE', '0') == '1'
+VISION_DETAIL = os.getenv('VISION_DETAIL', 'auto')
+
+# Páginas con capa de texto: se envían como texto, agrupadas, sin pasar por visión
+TEXT_ROUTE = os.getenv('TEXT_ROUTE', '1') == '1'
+TEXT_MIN_CHARS = int(os.getenv('TEXT_MIN_CHARS', '200'))
+TEXT_MAX_IMAGE_COVERAGE = float(os.getenv('TEXT_MAX_IMAGE_COVERAGE', '0.35'))
+TEXT_BATCH_PAGES = int(os.getenv('TEXT_BATCH_PAGES', '4'))
+
+# Páginas escaneadas por solicitud de visión; el lote se cierra antes si supera el peso máximo
+VISION_BATCH_PAGES = int(os.getenv('VISION_BATCH_PAGES', '4'))
+VISION_BATCH_MAX_KB = int(os.getenv('VISION_BATCH_MAX_KB', '1536'))
+
+# Páginas repetidas en el ZIP: idénticas (hash exacto) y casi idénticas (dHash a pocos bits,
+# solo dentro de la misma carpeta y confirmadas píxel a píxel). "Casi idénticas" cubre solo la misma
+# imagen recodificada (otro formato o calidad), no un documento escaneado dos veces
+DEDUP = os.getenv('DEDUP', '1') == '1'
+DEDUP_PERCEPTUAL = os.getenv('DEDUP_PERCEPTUAL', '0') == '1'
+DEDUP_MAX_DISTANCE = int(os.getenv('DEDUP_MAX_DISTANCE', '6'))
+
+# Límites de lectura del ZIP subido (protección contra zip bombs)
+ZIP_LIMITS = ZipLimits(
+    max_member_bytes=int(os.getenv('ZIP_MAX_MEMBER_MB', '200')) * 1024 * 1024,
+    max_total_bytes=int(os.getenv('ZIP_MAX_TOTAL_MB', '4096')) * 1024 * 1024,
+    max_ratio=float(os.getenv('ZIP_MAX_RATIO', '100')),
+    max_members=int(os.getenv('ZIP_MAX_MEMBERS', '20000')),
+)
+
+
+def _open_cache(name):
+    cache = ResultCache(os.path.join(CACHE_DIR, name), max_bytes=VISION_CACHE_MAX_MB * 1024 * 1024,
+                        ttl=VISION_CACHE_TTL_DAYS * 24 * 3600)
+    # Las entradas vencidas que nadie vuelve a pedir se borran al abrir la caché
+    cache.purge_expired()
+    return cache
+
+
+def open_vision_cache():
+    return _open_cache('vision.sqlite')
+
+
+def open_propuesta_cache():
+    return _open_cache('propuestas.sqlite')
+
+
+def prune_old_jobs(keep=()):
+    return prune_jobs(max_bytes=JOB_MAX_MB * 1024 * 1024, ttl=JOB_TTL_DAYS * 24 * 3600, keep=keep)
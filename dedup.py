@@ -0,0 +1,161 @@
+import io
+import math
+import hashlib
+
+from PIL import Image as PILImage, ImageChops
+
+# Tokens por imagen que cobra cada modelo de visión: (base, por bloque de 512 px)
+IMAGE_TOKENS = {
+    'gpt-4o-mini': (2833, 5667),
+}
+DEFAULT_IMAGE_TOKENS = (85, 170)
+
+
+def estimate_tokens(text):
+    # Estimación local, sin tokenizador: unos 4 caracteres por token en español
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def image_tokens(width, height, detail='auto', model='gpt-4o-mini'):
+    base, per_tile = IMAGE_TOKENS.get(model, DEFAULT_IMAGE_TOKENS)
+    if detail == 'low':
+        return base
+    # Misma escala que aplica la API: cabe en 2048x2048 y el lado corto queda en 768
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return base + per_tile * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def dhash(img, hash_size=16):
+    """Hash perceptual por diferencias: compara cada píxel con su vecino de la derecha."""
+    # En JPEG, draft decodifica directamente a una escala reducida
+    img.draft('L', (hash_size * 4, hash_size * 4))
+    pixels = img.convert('L').resize((hash_size + 1, hash_size), PILImage.BILINEAR).tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = bits << 1 | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def same_pixels(a, b, tolerance=24, max_changed=0.0001):
+    """Compara dos páginas a resolución completa en escala de grises.
+
+    Son la misma página si tienen el mismo tamaño y a lo más `max_changed`
+    de los píxeles difiere en más de `tolerance` niveles (ruido de compresión).
+    """
+    a = PILImage.open(io.BytesIO(a))
+    b = PILImage.open(io.BytesIO(b))
+    if a.size != b.size:
+        return False
+    histogram = ImageChops.difference(a.convert('L'), b.convert('L')).histogram()
+    return sum(histogram[tolerance + 1:]) <= max_changed * a.size[0] * a.size[1]
+
+
+def collapse_repeats(parts):
+    # Quita las partes repetidas conservando el orden de la primera aparición
+    return list(dict.fromkeys(parts))
+
+
+class PageDeduplicator:
+    """Analiza una sola vez las páginas repetidas de todo el ZIP.
+
+    Las páginas idénticas se reconocen por SHA-256 de sus bytes (imágenes) o
+    de su texto normalizado (lotes de texto), en todo el ZIP. Las imágenes
+    casi idénticas solo se buscan dentro de la misma carpeta: el dHash
+    propone candidatos a menos de `max_distance` bits y cada candidato se
+    confirma con `same_pixels`, porque dos formularios de la misma plantilla
+    con datos de estudiantes distintos quedan a pocos bits. Esa confirmación
+    solo acepta la misma imagen recodificada (otro formato, compresión o
+    calidad); un documento escaneado dos veces no pasa: el ruido y el
+    desalineamiento de un segundo escaneo son mayores que un nombre o un RUT
+    distinto sobre la misma plantilla. Los duplicados reciben el mismo Future
+    que la página original.
+    """
+
+    def __init__(self, perceptual=False, max_distance=6, hash_size=16, detail='auto', model='gpt-4o-mini',
+                 metrics=None):
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.detail = detail
+        self.model = model
+        self.metrics = metrics
+        self.exact = {}
+        # Principio del palomar: a distancia <= max_distance, al menos una banda coincide exacta
+        bits = hash_size * hash_size
+        self.band_bits = math.ceil(bits / (max_distance + 1))
+        self.bands = [{} for _ in range(math.ceil(bits / self.band_bits))]
+        # El índice perceptual es de una sola carpeta a la vez; guarda los bytes para confirmar
+        self.folder = None
+        self.duplicates = {'image': 0, 'text': 0}
+        self.near = 0
+        self.tokens_saved = 0
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (i * self.band_bits)) & mask for i in range(len(self.bands))]
+
+    def _find_near(self, fingerprint, image_bytes):
+        checked = set()
+        for band, key in zip(self.bands, self._band_keys(fingerprint)):
+            for candidate, candidate_bytes, future in band.get(key, ()):
+                if candidate in checked or (candidate ^ fingerprint).bit_count() > self.max_distance:
+                    continue
+                checked.add(candidate)
+                if same_pixels(candidate_bytes, image_bytes):
+                    return future
+        return None
+
+    def _index(self, fingerprint, image_bytes, future):
+        for band, key in zip(self.bands, self._band_keys(fingerprint)):
+            band.setdefault(key, []).append((fingerprint, image_bytes, future))
+
+    def _enter(self, folder):
+        if folder != self.folder:
+            self.folder = folder
+            for band in self.bands:
+                band.clear()
+
+    def _saved(self, route, tokens):
+        self.duplicates[route] += 1
+        self.tokens_saved += tokens
+        if self.metrics is not None:
+            self.metrics.record_request('vision', route='dedup', cache_hit=True)
+
+    def text(self, texts, submit):
+        normalized = '\x00'.join(' '.join(text.split()) for text in texts)
+        key = 'text:' + hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        future = self.exact.get(key)
+        if future is not None:
+            self._saved('text', estimate_tokens(normalized))
+            return future
+        future = self.exact[key] = submit()
+        return future
+
+    def image(self, image_bytes, submit, folder=None):
+        key = 'image:' + hashlib.sha256(image_bytes).hexdigest()
+        future = self.exact.get(key)
+        fingerprint = None
+        img = None
+        if future is None and self.perceptual:
+            self._enter(folder)
+            img = PILImage.open(io.BytesIO(image_bytes))
+            size = img.size
+            fingerprint = dhash(img, self.hash_size)
+            future = self._find_near(fingerprint, image_bytes)
+            if future is not None:
+                self.near += 1
+        if future is not None:
+            if img is None:
+                size = PILImage.open(io.BytesIO(image_bytes)).size
+            self._saved('image', image_tokens(*size, detail=self.detail, model=self.model))
+            return future
+
+        future = self.exact[key] = submit(image_bytes)
+        if fingerprint is not None:
+            self._index(fingerprint, image_bytes, future)
+        return future
@@ -0,0 +1,91 @@
+import re
+import posixpath
+from dataclasses import dataclass
+
+# Carpetas con forma de RUT: 12345678, 12345678-9 o 1234567-K
+RUT_PATTERN = re.compile(r'^\d{7,8}(-?[\dkK])?$')
+
+
+class ZipIngestError(ValueError):
+    pass
+
+
+@dataclass
+class ZipLimits:
+    max_member_bytes: int = 200 * 1024 * 1024
+    max_total_bytes: int = 4 * 1024 * 1024 * 1024
+    max_ratio: float = 100.0
+    max_members: int = 20000
+
+
+@dataclass
+class PdfMember:
+    folder: str
+    name: str
+    info: object
+
+
+def _is_metadata(parts):
+    return any(part == '__MACOSX' or part.startswith('.') for part in parts)
+
+
+def scan_zip(zip_ref, limits=None):
+    """Valida la estructura y los límites del ZIP sin extraer nada.
+
+    Devuelve `(pdfs, rechazados, advertencias)`: los PDFs válidos ordenados
+    por carpeta, los miembros descartados con su motivo y las carpetas cuyo
+    nombre no parece un RUT. Un ZIP que excede los límites (posible zip bomb)
+    se rechaza completo con ZipIngestError.
+    """
+    limits = limits or ZipLimits()
+    infos = zip_ref.infolist()
+    if len(infos) > limits.max_members:
+        raise ZipIngestError(f"El ZIP tiene {len(infos)} archivos (máximo {limits.max_members})")
+
+    pdfs, rechazados, advertencias = [], [], []
+    total = 0
+    for info in infos:
+        if info.is_dir():
+            continue
+        name = info.filename
+        parts = [part for part in name.split('/') if part]
+        if not name.lower().endswith('.pdf'):
+            continue
+        # Antes que los metadatos: ".." también empieza con punto y no debe omitirse en silencio
+        if name.startswith('/') or '..' in parts or posixpath.isabs(name):
+            rechazados.append((name, "ruta no permitida"))
+            continue
+        if _is_metadata(parts):
+            continue
+        if len(parts) < 2:
+            rechazados.append((name, "el PDF no está dentro de una carpeta con el RUT"))
+            continue
+        if info.flag_bits & 0x1:
+            rechazados.append((name, "archivo cifrado"))
+            continue
+
+        if info.file_size > limits.max_member_bytes:
+            raise ZipIngestError(f"{name} ocupa {info.file_size} bytes descomprimido (máximo {limits.max_member_bytes})")
+        if info.compress_size and info.file_size / info.compress_size > limits.max_ratio:
+            raise ZipIngestError(f"{name} tiene una tasa de compresión sospechosa ({info.file_size / info.compress_size:.0f}x)")
+        total += info.file_size
+        if total > limits.max_total_bytes:
+            raise ZipIngestError(f"El contenido descomprimido supera {limits.max_total_bytes} bytes")
+
+        folder = parts[-2]
+        if not RUT_PATTERN.match(folder) and folder not in advertencias:
+            advertencias.append(folder)
+        pdfs.append(PdfMember(folder, name, info))
+
+    pdfs.sort(key=lambda member: (member.folder, member.name))
+    return pdfs, rechazados, advertencias
+
+
+def read_member(zip_ref, member, limits=None):
+    # Lee con tope: el tamaño declarado en el ZIP puede ser falso
+    limits = limits or ZipLimits()
+    with zip_ref.open(member.info) as f:
+        data = f.read(limits.max_member_bytes + 1)
+    if len(data) > limits.max_member_bytes:
+        raise ZipIngestError(f"{member.name} supera el tamaño máximo al descomprimirse")
+    return data
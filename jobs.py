@@ -0,0 +1,181 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+import pandas as pd
+
+from cache import CACHE_DIR
+
+WORK_DIR = os.getenv('REVDOC_WORK_DIR', os.path.join(CACHE_DIR, 'jobs'))
+
+
+def job_id(*blobs):
+    # Los archivos subidos definen el trabajo: la misma combinación retoma el mismo directorio
+    digest = hashlib.sha256()
+    for blob in blobs:
+        digest.update(len(blob).to_bytes(8, 'big'))
+        digest.update(blob)
+    return digest.hexdigest()[:20]
+
+
+def _job_usage(path):
+    # (última actividad, bytes) de un directorio de trabajo
+    last, size = os.path.getmtime(path), 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            last = max(last, stat.st_mtime)
+            size += stat.st_size
+    return last, size
+
+
+def prune_jobs(work_dir=WORK_DIR, max_bytes=None, ttl=None, keep=()):
+    """Borra los trabajos inactivos por más de `ttl` segundos y, si en total
+    superan `max_bytes`, los menos recientes hasta bajar al 90% del límite.
+
+    Los trabajos de `keep` no se tocan. Devuelve cuántos se borraron.
+    """
+    if not os.path.isdir(work_dir):
+        return 0
+    now = time.time()
+    jobs, kept = [], 0
+    for entry in os.scandir(work_dir):
+        if not entry.is_dir():
+            continue
+        last, size = _job_usage(entry.path)
+        if entry.name in keep:
+            # Ocupa espacio, pero no se puede borrar
+            kept += size
+        else:
+            jobs.append((last, size, entry.path))
+    jobs.sort()
+
+    stale = [job for job in jobs if ttl is not None and now - job[0] > ttl]
+    if max_bytes is not None:
+        remaining = [job for job in jobs if job not in stale]
+        total = kept + sum(size for _, size, _ in remaining)
+        if total > max_bytes:
+            target = total - int(max_bytes * 0.9)
+            freed = 0
+            for job in remaining:
+                if freed >= target:
+                    break
+                stale.append(job)
+                freed += job[1]
+
+    for _, _, path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+    return len(stale)
+
+
+class Job:
+    """Directorio de trabajo persistente con checkpoints por etapa y por unidad.
+
+    Cada etapa (análisis, fusión, propuestas, presentación) se marca como
+    terminada al guardar su resultado; dentro de una etapa, las unidades
+    (un PDF, una fila) se guardan a medida que terminan para poder retomar
+    un trabajo interrumpido desde la última unidad completa.
+    """
+
+    def __init__(self, job_id, work_dir=WORK_DIR):
+        self.id = job_id
+        self.dir = os.path.join(work_dir, job_id)
+        os.makedirs(self.dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path('checkpoints.sqlite'), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS stages (stage TEXT PRIMARY KEY, finished REAL NOT NULL)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS units (
+                stage TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (stage, unit)
+            )
+        """)
+        self.conn.commit()
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def save_input(self, name, data):
+        path = self.path(name)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        return path
+
+    def stage_done(self, stage):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM stages WHERE stage = ?", (stage,)).fetchone() is not None
+
+    def mark_done(self, stage):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO stages (stage, finished) VALUES (?, ?)", (stage, time.time()))
+            self.conn.commit()
+
+    def save_frame(self, stage, df):
+        df.to_pickle(self.path(f"{stage}.pkl"))
+        self.mark_done(stage)
+
+    def load_frame(self, stage):
+        return pd.read_pickle(self.path(f"{stage}.pkl"))
+
+    def get_unit(self, stage, unit):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM units WHERE stage = ? AND unit = ?", (stage, unit)).fetchone()
+        return row[0] if row else None
+
+    def put_unit(self, stage, unit, value):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO units (stage, unit, value) VALUES (?, ?, ?)", (stage, unit, value))
+            self.conn.commit()
+
+    def units(self, stage, skip=()):
+        return UnitStore(self, stage, skip)
+
+    def reset(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM stages")
+            self.conn.execute("DELETE FROM units")
+            self.conn.commit()
+        for name in os.listdir(self.dir):
+            path = self.path(name)
+            if name.startswith('checkpoints.sqlite') or name.startswith('uploaded.'):
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class UnitStore:
+    """Vista de las unidades de una etapa, con la interfaz get/put de un checkpoint.
+
+    Las unidades de `skip` no se leen ni se guardan: se recalculan en cada ejecución.
+    """
+
+    def __init__(self, job, stage, skip=()):
+        self.job = job
+        self.stage = stage
+        self.skip = {str(unit) for unit in skip}
+
+    def get(self, unit):
+        if str(unit) in self.skip:
+            return None
+        return self.job.get_unit(self.stage, str(unit))
+
+    def put(self, unit, value):
+        if str(unit) in self.skip:
+            return
+        self.job.put_unit(self.stage, str(unit), value)
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Orden de las etapas en el reporte; otras etapas se agregan al final
+STAGES = ['unzip', 'render', 'encode', 'vision', 'merge', 'compaction', 'proposal', 'slides', 'save']
+
+REQUEST_COLUMNS = ['stage', 'route', 'latency', 'payload_bytes', 'prompt_tokens', 'completion_tokens',
+                   'retries', 'cache_hit', 'failed', 'at']
+
+
+def _tokens(usage, name):
+    # `usage` llega como dict (API HTTP) o como objeto (cliente de OpenAI)
+    if usage is None:
+        return 0
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return value or 0
+
+
+class RunMetrics:
+    """Tiempos por etapa y detalle de cada solicitud de una ejecución.
+
+    `record_request` se puede llamar desde cualquier hilo. Los `listeners`
+    reciben `snapshot()` al cerrar una etapa o avanzar el progreso, siempre
+    desde el hilo que lleva el pipeline (Streamlit no acepta otros hilos).
+    """
+
+    def __init__(self, listeners=None, min_interval=0.5):
+        self.lock = threading.Lock()
+        self.started = datetime.now()
+        self.t0 = time.monotonic()
+        self.stage_seconds = {}
+        self.requests = []
+        self.progress = {}
+        self.counters = {}
+        self.current = None
+        self.listeners = list(listeners or [])
+        self.min_interval = min_interval
+        self.notified = 0.0
+
+    @contextmanager
+    def stage(self, name):
+        previous, self.current = self.current, name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+            self.current = previous
+            self.notify(force=True)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+    def record_request(self, stage, route=None, latency=None, payload_bytes=0, usage=None, retries=0,
+                       cache_hit=False, failed=False):
+        record = (stage, route or stage, latency, payload_bytes, _tokens(usage, 'prompt_tokens'),
+                  _tokens(usage, 'completion_tokens'), retries, cache_hit, failed, time.monotonic() - self.t0)
+        with self.lock:
+            self.requests.append(record)
+
+    def add_count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_progress(self, name, done, total):
+        self.progress[name] = (done, total)
+        self.notify()
+
+    def notify(self, force=False):
+        now = time.monotonic()
+        if not self.listeners or (not force and now - self.notified < self.min_interval):
+            return
+        self.notified = now
+        snapshot = self.snapshot()
+        for listener in self.listeners:
+            listener(snapshot)
+
+    def snapshot(self):
+        with self.lock:
+            requests = list(self.requests)
+        elapsed = time.monotonic() - self.t0
+        live = [r for r in requests if not r[7]]
+        return {
+            "elapsed": elapsed,
+            "stage": self.current,
+            "progress": dict(self.progress),
+            "requests": len(live),
+            "cache_hits": len(requests) - len(live),
+            "failed": sum(1 for r in live if r[8]),
+            "throughput": len(live) / elapsed if elapsed else 0.0,
+            "tokens": sum(r[4] + r[5] for r in live),
+        }
+
+    def requests_frame(self):
+        with self.lock:
+            return pd.DataFrame(self.requests, columns=REQUEST_COLUMNS)
+
+    def summary(self):
+        requests = self.requests_frame()
+        names = [name for name in STAGES if name in self.stage_seconds or name in set(requests['stage'])]
+        names += sorted((set(self.stage_seconds) | set(requests['stage'])) - set(names))
+
+        rows = []
+        for name in names:
+            stage_requests = requests[requests['stage'] == name]
+            live = stage_requests[~stage_requests['cache_hit'].astype(bool)]
+            latency = live['latency'].dropna()
+            rows.append({
+                "stage": name,
+                "seconds": round(self.stage_seconds.get(name, 0.0), 3),
+                "requests": len(live),
+                "cache_hits": len(stage_requests) - len(live),
+                "failed": int(live['failed'].sum()),
+                "retries": int(live['retries'].sum()),
+                "payload_bytes": int(live['payload_bytes'].sum()),
+                "prompt_tokens": int(live['prompt_tokens'].sum()),
+                "completion_tokens": int(live['completion_tokens'].sum()),
+                "total_tokens": int(live['prompt_tokens'].sum() + live['completion_tokens'].sum()),
+                "p50_latency": round(latency.quantile(0.5), 3) if len(latency) else None,
+                "p95_latency": round(latency.quantile(0.95), 3) if len(latency) else None,
+            })
+        return pd.DataFrame(rows)
+
+    def report(self):
+        summary = self.summary()
+        return {
+            "started": self.started.isoformat(timespec='seconds'),
+            "wall_seconds": round(time.monotonic() - self.t0, 3),
+            "stages": summary.astype(object).where(summary.notna(), None).to_dict('records'),
+            "total_tokens": int(summary['total_tokens'].sum()) if len(summary) else 0,
+            "requests": int(summary['requests'].sum()) if len(summary) else 0,
+            "counters": dict(self.counters),
+        }
+
+    def report_json(self):
+        return json.dumps(self.report(), ensure_ascii=False, indent=2)
+
+    def summary_csv(self):
+        return self.summary().to_csv(index=False)
+
+    def export(self, directory, name="run_report"):
+        # Reporte de la ejecución: resumen en JSON y CSV, y el detalle por solicitud en CSV
+        paths = {
+            "json": os.path.join(directory, f"{name}.json"),
+            "csv": os.path.join(directory, f"{name}.csv"),
+            "requests": os.path.join(directory, f"{name}_requests.csv"),
+        }
+        with open(paths["json"], 'w', encoding='utf-8') as f:
+            f.write(self.report_json())
+        with open(paths["csv"], 'w', encoding='utf-8', newline='') as f:
+            f.write(self.summary_csv())
+        self.requests_frame().to_csv(paths["requests"], index=False)
+        return paths
@@ -0,0 +1,464 @@
+import io
+import sys
+import time
+import zipfile
+
+import pandas as pd
+
+import config
+from vision import PageAnalysisEngine, ImageBatcher, ANALYSIS_FAILED, CHAT_COMPLETIONS_URL, VISION_MODEL
+from propuestas import GeneradorPropuestas, COLUMNAS_PROPUESTA, PROPUESTA_FALLIDA
+from render import PageRenderer, PayloadOptimizer, PageClassifier, iter_page_routes, open_pdf, PDF_ERRORS
+from slides import create_presentation_from_dataframe
+from ingest import scan_zip, read_member
+from metrics import RunMetrics
+from writers import frame_to_xlsx_bytes
+from dedup import PageDeduplicator, collapse_repeats, estimate_tokens
+from compactacion import Compactador
+
+
+class ConsoleReporter:
+    """Salida del pipeline en consola; app.py usa su equivalente en Streamlit."""
+
+    def write(self, text):
+        print(text)
+
+    def success(self, text):
+        print(text)
+
+    def warning(self, text):
+        print(f"ADVERTENCIA: {text}", file=sys.stderr)
+
+    def error(self, text):
+        print(f"ERROR: {text}", file=sys.stderr)
+
+    def table(self, title, df):
+        pass
+
+    def metrics(self, title, values, caption=None):
+        print(f"{title}: " + ", ".join(f"{name}={value}" for name, value in values.items()))
+
+    def live(self, snapshot):
+        pass
+
+
+def make_renderer():
+    if config.PAYLOAD_MAX_KB > 0:
+        return PayloadOptimizer(max_bytes=config.PAYLOAD_MAX_KB * 1024, max_pixels=config.PAYLOAD_MAX_PIXELS,
+                                fmt=config.RENDER_FORMAT if config.RENDER_FORMAT != 'png' else 'jpeg',
+                                crop_margins=config.PAYLOAD_CROP_MARGINS,
+                                measure_baseline=config.PAYLOAD_MEASURE_BASELINE)
+    return PageRenderer(config.RENDER_FORMAT, quality=config.RENDER_QUALITY, dpi=config.RENDER_DPI)
+
+
+def make_classifier():
+    if not config.TEXT_ROUTE:
+        return None
+    return PageClassifier(config.TEXT_MIN_CHARS, config.TEXT_MAX_IMAGE_COVERAGE)
+
+
+def make_engine(api_key, cache=None, endpoint=CHAT_COMPLETIONS_URL, metrics=None):
+    return PageAnalysisEngine(api_key, max_workers=config.VISION_CONCURRENCY, requests_per_second=config.VISION_RPS,
+                              max_retries=config.VISION_MAX_RETRIES, timeout=config.VISION_TIMEOUT, cache=cache,
+                              endpoint=endpoint, metrics=metrics)
+
+
+def make_dedup(metrics=None):
+    if not config.DEDUP:
+        return None
+    return PageDeduplicator(perceptual=config.DEDUP_PERCEPTUAL, max_distance=config.DEDUP_MAX_DISTANCE,
+                            detail=config.VISION_DETAIL, model=VISION_MODEL, metrics=metrics)
+
+
+class PageSubmitter:
+    """Envía las páginas de un PDF al motor según su ruta y devuelve sus futures en orden.
+
+    Con `dedup`, las páginas repetidas reciben el future de su primera aparición.
+    """
+
+    def __init__(self, engine, mime, dedup=None):
+        self.engine = engine
+        self.dedup = dedup
+        self.batcher = ImageBatcher(engine, max_pages=config.VISION_BATCH_PAGES,
+                                    max_bytes=config.VISION_BATCH_MAX_KB * 1024,
+                                    mime=mime, detail=config.VISION_DETAIL)
+        self.route_pages = {'text': 0, 'image': 0}
+        self.text_requests = 0
+
+    def _submit_text(self, text_batch, page_futures):
+        def submit():
+            self.text_requests += 1
+            return self.engine.submit_text(text_batch)
+        page_futures.append(self.dedup.text(text_batch, submit) if self.dedup is not None else submit())
+
+    def submit_pages(self, routed_pages, folder=None):
+        page_futures = []
+        text_batch = []
+        for route, page_num, content in routed_pages:
+            self.route_pages[route] += 1
+            if route == 'text':
+                text_batch.append(content)
+                if len(text_batch) < config.TEXT_BATCH_PAGES:
+                    continue
+            # Las páginas de texto consecutivas se envían juntas, en su posición
+            if text_batch:
+                self._submit_text(text_batch, page_futures)
+                text_batch = []
+            if route == 'image':
+                if self.dedup is not None:
+                    page_futures.append(self.dedup.image(content, self.batcher.add, folder))
+                else:
+                    page_futures.append(self.batcher.add(content))
+        if text_batch:
+            self._submit_text(text_batch, page_futures)
+        return page_futures
+
+    def flush(self):
+        self.batcher.flush()
+
+
+def report_dedup(reporter, submitter, accumulator=None):
+    dedup = submitter.dedup
+    if dedup is not None and (dedup.duplicates['image'] or dedup.duplicates['text']):
+        # Las imágenes viajan en lotes: las solicitudes evitadas se estiman con el tamaño medio del lote
+        unique_images = submitter.route_pages['image'] - dedup.duplicates['image']
+        pages_per_request = unique_images / submitter.batcher.requests if submitter.batcher.requests else 1
+        calls = dedup.duplicates['text'] + dedup.duplicates['image'] / max(1.0, pages_per_request)
+        reporter.write(f"Páginas repetidas analizadas una sola vez: {dedup.duplicates['image']} imágenes "
+                       f"({dedup.near} casi idénticas) y {dedup.duplicates['text']} lotes de texto — "
+                       f"~{calls:.0f} solicitudes y ~{dedup.tokens_saved} tokens de prompt evitados")
+    if accumulator is not None and accumulator.collapsed:
+        reporter.write(f"Análisis repetidos quitados del texto concatenado: {accumulator.collapsed} "
+                       f"(~{accumulator.tokens_saved} tokens menos en los prompts de propuestas)")
+
+
+def report_analysis(reporter, engine, submitter, payload_stats, cache=None):
+    for error in engine.errors:
+        reporter.error(error)
+
+    route_pages = submitter.route_pages
+    reporter.write(f"Páginas por imagen: {route_pages['image']} en {submitter.batcher.requests} solicitudes — "
+                   f"páginas por texto: {route_pages['text']} en {submitter.text_requests} solicitudes")
+    image_latency = engine.latencies.get('image', []) + engine.latencies.get('batch', [])
+    text_latency = engine.latencies.get('text', [])
+    if route_pages['text'] and route_pages['image']:
+        estimate = ""
+        if image_latency and text_latency:
+            # Estimación por solicitud: cada solicitud de texto habría sido una solicitud de visión
+            per_request = sum(image_latency) / len(image_latency) - sum(text_latency) / len(text_latency)
+            saved = per_request * len(text_latency)
+            if saved >= 0.5:
+                estimate = f" (~{saved:.0f} s de llamadas ahorrados)"
+        reporter.write(f"Llamadas de visión evitadas: {route_pages['text']}{estimate}")
+
+    if payload_stats:
+        payload_stats = pd.DataFrame([stat.as_dict() for stat in payload_stats])
+        after = payload_stats['bytes_after'].sum()
+        if payload_stats['bytes_before'].notna().all():
+            before = payload_stats['bytes_before'].sum()
+            reporter.write(f"Imágenes enviadas: {after / 1024:.0f} KB (antes {before / 1024:.0f} KB)")
+        else:
+            reporter.write(f"Imágenes enviadas: {after / 1024:.0f} KB")
+        reporter.table("Detalle de imágenes por página", payload_stats)
+
+    if cache is not None:
+        stats = cache.stats()
+        reporter.metrics("Caché de análisis", {"Aciertos": stats['hits'], "Fallos": stats['misses']},
+                         caption=f"{stats['entries']} entradas, {stats['bytes'] / 1024 / 1024:.1f} MB")
+
+
+class AnalysisAccumulator:
+    """Acumula el análisis concatenado por carpeta, en columnas.
+
+    Los PDFs llegan agrupados por carpeta (scan_zip los ordena), de modo que
+    las partes de una carpeta se unen al pasar a la siguiente y solo queda
+    una cadena por carpeta en memoria, no una fila por PDF. Las partes
+    repetidas dentro de una carpeta (páginas o PDFs duplicados) se incluyen
+    una sola vez.
+    """
+
+    def __init__(self):
+        self.folders = []
+        self.analyses = []
+        self.current = None
+        self.parts = []
+        self.collapsed = 0
+        self.tokens_saved = 0
+
+    def append(self, folder, parts):
+        folder = str(folder)
+        if folder != self.current:
+            self._close()
+            self.current = folder
+        self.parts.extend(parts)
+
+    def _close(self):
+        if self.parts:
+            parts = collapse_repeats(self.parts)
+            if len(parts) < len(self.parts):
+                joined = ' '.join(self.parts)
+                self.collapsed += len(self.parts) - len(parts)
+                self.tokens_saved += estimate_tokens(joined) - estimate_tokens(' '.join(parts))
+            self.folders.append(self.current)
+            self.analyses.append(' '.join(parts))
+            self.parts = []
+
+    def frame(self):
+        self._close()
+        result = pd.DataFrame({'Folder': pd.Categorical(self.folders), 'Análisis_concatenado': self.analyses})
+        if result['Folder'].duplicated().any():
+            # Entrada no agrupada por carpeta: se unen las partes igual que antes
+            result = (result.groupby('Folder', observed=True)['Análisis_concatenado']
+                      .agg(lambda parts: parts.str.cat(sep=' ')).reset_index())
+        return result.sort_values('Folder', ignore_index=True)
+
+
+def name_payload_stats(renderer, start, name):
+    # Los documentos abiertos desde memoria no tienen nombre propio
+    for stat in getattr(renderer, 'stats', [])[start:]:
+        stat.document = name
+
+
+def report_ingest(reporter, rechazados, advertencias):
+    for name, motivo in rechazados:
+        reporter.warning(f"Se omite {name}: {motivo}")
+    if advertencias:
+        reporter.warning(f"Carpetas cuyo nombre no parece un RUT: {', '.join(advertencias)}")
+
+
+# Funciones para analizar documentos PDF
+def process_pdfs_in_zip(zip_path, api_key, checkpoint=None, reporter=None, cache=None, metrics=None,
+                        endpoint=CHAT_COMPLETIONS_URL):
+    reporter = reporter or ConsoleReporter()
+    metrics = metrics if metrics is not None else RunMetrics()
+
+    # Cada PDF guarda sus futures en orden de página; las llamadas de visión
+    # corren en paralelo mientras se siguen leyendo y renderizando los PDFs
+    pending = []
+    renderer = make_renderer()
+    classifier = make_classifier()
+
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref, make_engine(api_key, cache, endpoint, metrics) as engine:
+        # La estructura y los límites se validan antes de leer cualquier PDF
+        with metrics.stage('unzip'):
+            members, rechazados, advertencias = scan_zip(zip_ref, config.ZIP_LIMITS)
+        report_ingest(reporter, rechazados, advertencias)
+
+        submitter = PageSubmitter(engine, renderer.mime, make_dedup(metrics))
+        current_folder = None
+        for position, member in enumerate(members, start=1):
+            metrics.set_progress('render', position, len(members))
+            saved = checkpoint.get(member.name) if checkpoint is not None else None
+            if saved is not None:
+                # Ya analizado en una ejecución anterior de este trabajo
+                pending.append((member.folder, member.name, saved))
+                continue
+            if member.folder != current_folder:
+                # Los lotes pueden mezclar PDFs pequeños, pero nunca carpetas distintas
+                submitter.flush()
+                current_folder = member.folder
+            reporter.write(f"Processing {member.name}...")
+
+            # El PDF se abre desde memoria; nada se extrae a disco
+            started = time.perf_counter()
+            data = read_member(zip_ref, member, config.ZIP_LIMITS)
+            metrics.add_time('unzip', time.perf_counter() - started)
+            first_stat = len(getattr(renderer, 'stats', []))
+            try:
+                with open_pdf(data) as pdf_document:
+                    page_futures = submitter.submit_pages(iter_page_routes(pdf_document, renderer, classifier),
+                                                          member.folder)
+            except PDF_ERRORS as e:
+                # Un PDF dañado se omite; el resto del ZIP se sigue procesando
+                report_ingest(reporter, [(member.name, f"PDF dañado o ilegible ({e})")], [])
+                continue
+            name_payload_stats(renderer, first_stat, member.name)
+
+            pending.append((member.folder, member.name, page_futures))
+        submitter.flush()
+        for name, seconds in renderer.timings.items():
+            metrics.add_time(name, seconds)
+
+        accumulator = AnalysisAccumulator()
+        # Tiempo que se espera a las llamadas de visión una vez enviadas todas las páginas
+        with metrics.stage('vision'):
+            for done, (folder_name, unit, page_futures) in enumerate(pending, start=1):
+                if isinstance(page_futures, str):
+                    pdf_analysis = [page_futures]
+                else:
+                    pdf_analysis = [future.result() for future in page_futures]
+                    # Los PDFs con páginas fallidas no se guardan, para reintentarlos al retomar
+                    if checkpoint is not None and ANALYSIS_FAILED not in pdf_analysis:
+                        checkpoint.put(unit, " ".join(pdf_analysis))
+                accumulator.append(folder_name, pdf_analysis)
+                metrics.set_progress('vision', done, len(pending))
+
+    report_analysis(reporter, engine, submitter, getattr(renderer, 'stats', None), cache)
+    results = accumulator.frame()
+    report_dedup(reporter, submitter, accumulator)
+
+    return results
+
+
+def read_students_excel(excel_path):
+    # Leer el archivo Excel
+    data2 = pd.read_excel(excel_path)
+
+    # Renombrar la columna 'RUT:' a 'Folder' si existe
+    if 'RUT:' in data2.columns:
+        data2.rename(columns={'RUT:': 'Folder'}, inplace=True)
+
+    # Asegurarse de que 'Folder' sea de tipo string
+    data2['Folder'] = data2['Folder'].astype(str)
+    return data2
+
+
+def merge_analysis_with_excel(excel_path, pdf_analysis_results):
+    data2 = read_students_excel(excel_path)
+
+    # Left join por carpeta sin copiar el Excel: cada carpeta tiene un solo análisis
+    analisis = pd.Series(pdf_analysis_results['Análisis_concatenado'].values,
+                         index=pdf_analysis_results['Folder'].astype(str))
+    data2['Análisis_concatenado'] = data2['Folder'].map(analisis)
+
+    return data2
+
+
+def make_generador(client, cache=None, metrics=None):
+    compactador = None
+    if config.PROPUESTA_ANALISIS_MAX_TOKENS > 0:
+        compactador = Compactador(client.with_options(max_retries=config.PROPUESTA_MAX_RETRIES,
+                                                      timeout=config.PROPUESTA_TIMEOUT),
+                                  presupuesto=config.PROPUESTA_ANALISIS_MAX_TOKENS,
+                                  modelo=config.COMPACTACION_MODELO, cache=cache, metrics=metrics)
+    return GeneradorPropuestas(client, max_workers=config.PROPUESTA_CONCURRENCY,
+                               max_retries=config.PROPUESTA_MAX_RETRIES, timeout=config.PROPUESTA_TIMEOUT,
+                               cache=cache, reglas=config.PROPUESTA_REGLAS, metrics=metrics, compactador=compactador)
+
+
+def report_propuestas(reporter, generador, total, cache=None):
+    reporter.write(f"Propuestas resueltas por reglas: {generador.omitidas} de {total} "
+                   f"({generador.omitidas} llamadas al modelo evitadas)")
+    compactador = generador.compactador
+    if compactador is not None and compactador.tokens_antes:
+        reporter.metrics("Análisis en los prompts", {"Tokens antes": compactador.tokens_antes,
+                                                      "Tokens después": compactador.tokens_despues},
+                         caption=f"{compactador.resumidas} filas resumidas con {compactador.llamadas} llamadas")
+    if generador.malformadas:
+        reporter.warning(f"Respuestas con formato inválido: {generador.malformadas} "
+                         f"(filas sin propuesta tras reintentar: {generador.fallidas})")
+
+    if cache is not None:
+        reporter.metrics("Caché de propuestas", {"Aciertos": cache.stats()['hits'], "Llamadas": generador.llamadas})
+
+
+def generar_propuesta_resolucion(filas, client, checkpoint=None, reporter=None, cache=None, metrics=None):
+    reporter = reporter or ConsoleReporter()
+    generador = make_generador(client, cache, metrics)
+    resultados = generador.generar(filas, checkpoint=checkpoint)
+    report_propuestas(reporter, generador, len(filas), cache)
+    return resultados
+
+
+def report_metrics(reporter, metrics):
+    summary = metrics.summary()
+    if len(summary):
+        reporter.table("Tiempos, latencias y tokens por etapa", summary)
+    report = metrics.report()
+    reporter.write(f"Tiempo total: {report['wall_seconds']:.1f} s — {report['requests']} solicitudes, "
+                   f"{report['total_tokens']} tokens")
+
+
+def run_job(job, zip_path, excel_path, api_key, client, reporter=None, vision_cache=None, propuesta_cache=None,
+            metrics=None):
+    """Ejecuta (o retoma) las etapas del trabajo y devuelve las salidas como bytes listos para descargar.
+
+    Una etapa solo se marca terminada cuando todas sus unidades salieron bien;
+    si no, la próxima ejecución la retoma y recalcula las unidades que faltan.
+    """
+    reporter = reporter or ConsoleReporter()
+    metrics = metrics if metrics is not None else RunMetrics(listeners=[reporter.live])
+
+    # Cada etapa terminada se lee desde su checkpoint en lugar de recalcularse
+    analisis_completo = True
+    if job.stage_done('analisis'):
+        pdf_analysis_results = job.load_frame('analisis')
+    else:
+        pdf_analysis_results = process_pdfs_in_zip(zip_path, api_key, checkpoint=job.units('analisis'),
+                                                   reporter=reporter, cache=vision_cache, metrics=metrics)
+        # Los PDFs con páginas fallidas no quedaron en el checkpoint de unidades
+        fallidas = int(pdf_analysis_results['Análisis_concatenado'].fillna('').str.contains(ANALYSIS_FAILED, regex=False).sum())
+        analisis_completo = fallidas == 0
+        if analisis_completo:
+            with metrics.stage('save'):
+                job.save_frame('analisis', pdf_analysis_results)
+        else:
+            reporter.warning(f"{fallidas} carpetas tienen páginas que no se pudieron analizar; "
+                             "se reintentarán al volver a ejecutar el trabajo")
+
+    if job.stage_done('fusion'):
+        df = job.load_frame('fusion')
+    else:
+        # Fusionar el análisis de PDF con el DataFrame del Excel
+        with metrics.stage('merge'):
+            df = merge_analysis_with_excel(excel_path, pdf_analysis_results)
+        if analisis_completo:
+            with metrics.stage('save'):
+                job.save_frame('fusion', df)
+
+    reporter.success("Análisis de PDFs completado y fusionado con el Excel original.")
+
+    propuestas_completas = analisis_completo
+    if job.stage_done('propuestas'):
+        df_final = job.load_frame('propuestas')
+    else:
+        # Las filas con análisis incompleto no se guardan: al reintentar, su análisis puede cambiar
+        incompletas = df.index[df['Análisis_concatenado'].fillna('').str.contains(ANALYSIS_FAILED, regex=False)]
+        with metrics.stage('proposal'):
+            propuestas = generar_propuesta_resolucion(df, client, checkpoint=job.units('propuestas', skip=incompletas),
+                                                      reporter=reporter, cache=propuesta_cache, metrics=metrics)
+        df_propuestas = pd.DataFrame(propuestas, columns=COLUMNAS_PROPUESTA)
+        df_final = pd.concat([df, df_propuestas], axis=1)
+        fallidas = sum(1 for columnas in propuestas if columnas == PROPUESTA_FALLIDA)
+        propuestas_completas = analisis_completo and fallidas == 0
+        if propuestas_completas:
+            with metrics.stage('save'):
+                job.save_frame('propuestas', df_final)
+        elif fallidas:
+            reporter.warning(f"{fallidas} filas quedaron sin propuesta; se reintentarán al volver a ejecutar el trabajo")
+
+    reporter.success("Propuesta de resolución generada.")
+
+    # Los libros de Excel se arman en memoria desde los checkpoints, en modo write-only
+    with metrics.stage('save'):
+        excel_con_analisis = frame_to_xlsx_bytes(df)
+        resultado_final = frame_to_xlsx_bytes(df_final)
+
+    # La presentación se guarda en el trabajo para no reconstruirla al retomar
+    pptx_path = job.path("presentacion_estudiantes.pptx")
+    if job.stage_done('presentacion'):
+        with open(pptx_path, 'rb') as f:
+            presentacion = f.read()
+    else:
+        buffer = io.BytesIO()
+        with metrics.stage('slides'):
+            create_presentation_from_dataframe(df_final, buffer)
+        presentacion = buffer.getvalue()
+        if propuestas_completas:
+            with open(pptx_path, 'wb') as f:
+                f.write(presentacion)
+            job.mark_done('presentacion')
+
+    reporter.success("Presentación PowerPoint generada.")
+
+    report_metrics(reporter, metrics)
+    metrics.export(job.dir)
+
+    return {
+        "excel_con_analisis": excel_con_analisis,
+        "resultado_final": resultado_final,
+        "presentacion": presentacion,
+        "reporte_json": metrics.report_json().encode('utf-8'),
+        "reporte_csv": metrics.summary_csv().encode('utf-8'),
+        "incompleto": not propuestas_completas,
+    }
@@ -0,0 +1,258 @@
+import json
+import time
+import threading
+from dataclasses import dataclass, asdict, fields
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+from cache import cache_key
+from metrics import RunMetrics
+from reglas import aplicar_reglas, REGLAS_POR_DEFECTO
+
+MODELO_PROPUESTA = "gpt-4o-mini"
+COLUMNAS_PROPUESTA = ["Propuesta Resolución", "RESOLUCIÓN", "MONTO DE LA BECA", "MOTIVO DEL CASO", "DOCUMENTOS"]
+PROPUESTA_FALLIDA = ["", "Propuesta no generada: el modelo no entregó una respuesta válida", "", "", ""]
+
+
+def construir_prompt(fila):
+    return f"""
+A continuación se presenta la información de un estudiante. Con base en esta información, por favor genera una "Propuesta Resolución" que indique si se aprueba o rechaza la solicitud de beca, y los detalles de la resolución. Usa las siguientes condiciones para tomar la decisión:
+
+1. Si el PPE es menor a 0.5, rechaza la solicitud porque no cumple con el requisito mínimo.
+2. Si la deuda vencida en el sistema es 0, rechaza la solicitud porque no hay deuda a cubrir.
+3. Si los documentos han sido validados por una Trabajadora Social y el estudiante tiene una deuda vencida mayor que 0, aprueba la solicitud con los detalles correspondientes.
+4. Si el estudiante ha recibido beneficios anteriormente, verifica si hay algún incumplimiento relacionado y decide en consecuencia.
+
+Información del Estudiante:
+PPE: {fila['PPE']}
+Nombre completo: {fila['Nombre completo']}
+RUT: {fila['Folder']}
+Sede: {fila['Sede']}
+Carrera: {fila['Carrera']}
+Vigencia con cursos inscritos: {fila['Vigencia con cursos inscritos']}
+Año y Semestre de ingreso: {fila['Año y Semestre de ingreso']}
+Motivo solicitud: {fila['Motivo solicitud.']}
+¿Ha recibido beneficios anteriormente? ¿Cuál?: {fila['¿Ha recibido beneficios anteriormente? ¿Cuál?']}
+Última fecha en que se entregó el Beneficio: {fila['Última fecha en que se entregó el Beneficio']}
+Deuda vencida en sistema: {fila['Deuda vencida en sistema']}
+Análisis_concatenado: {fila['Análisis_concatenado']}
+
+Por favor, genera una respuesta como un objeto JSON con los siguientes campos, que corresponden a las columnas Propuesta Resolución, RESOLUCIÓN, MONTO DE LA BECA, MOTIVO DEL CASO y DOCUMENTOS:
+"propuesta_resolucion", "resolucion", "monto_beca", "motivo_caso", "documentos"
+
+**El campo "propuesta_resolucion" debe ser exactamente "Aprobada" o "Rechazada".**
+
+**El campo "resolucion" debe contener la decisión tomada sobre la solicitud (aprobada o rechazada) y la justificación basada en los criterios establecidos.**
+
+**El campo "motivo_caso" debe contener un resumen muy breve de la situación presentada por el estudiante en su carta de solicitud, incluyendo detalles como problemas económicos, personales o académicos mencionados. Este campo no debe repetir el contenido de "resolucion", sino que debe reflejar la situación específica del estudiante tal como se describe en la carta.**
+
+**En el campo "motivo_caso", proporciona una descripción detallada en el siguiente formato: "Se informa lo siguiente: >[Detalle1]. >[Detalle2]. >[Detalle3].".**
+
+Ejemplo:
+{{"propuesta_resolucion": "Aprobada", "resolucion": "La solicitud de beca se aprueba...", "monto_beca": "Monto a determinar según normativa", "motivo_caso": "Los Documentos informan lo siguiente >Familia extensa. >Un integrante genera ingresos formales (pensión). >El estudiante no encuentra empleo y recibe ayuda económica de su tío y abuela. >Postulación FUAS: octubre de 2022. >No presenta resultados MINEDUC. >Se sugiere aprobar la solicitud.", "documentos": "Carta de solicitud de beca; Registro Social de Hogares; Certificado de remuneraciones; Finiquitos; Certificado de cotizaciones; Licencias medicas; Comprobante de gastos mensuales; Certificado de desempleo"}}
+
+**Usa punto y coma para separar múltiples documentos en el campo "documentos".**
+"""
+
+
+def construir_mensajes(prompt):
+    return [
+        {"role": "system", "content": "Eres un asistente social."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+class PropuestaInvalida(ValueError):
+    pass
+
+
+@dataclass
+class Propuesta:
+    propuesta_resolucion: str
+    resolucion: str
+    monto_beca: str
+    motivo_caso: str
+    documentos: str
+
+    DECISIONES = ("Aprobada", "Rechazada")
+
+    @classmethod
+    def desde_json(cls, contenido):
+        try:
+            datos = json.loads(contenido)
+        except (TypeError, ValueError) as e:
+            raise PropuestaInvalida(f"La respuesta no es JSON válido: {e}")
+        if not isinstance(datos, dict):
+            raise PropuestaInvalida("La respuesta no es un objeto JSON")
+
+        campos = [campo.name for campo in fields(cls)]
+        faltantes = [campo for campo in campos if not isinstance(datos.get(campo), str) or not datos[campo].strip()]
+        if faltantes:
+            raise PropuestaInvalida(f"Campos faltantes o vacíos: {', '.join(faltantes)}")
+
+        propuesta = cls(**{campo: datos[campo].strip() for campo in campos})
+        if propuesta.propuesta_resolucion not in cls.DECISIONES:
+            raise PropuestaInvalida(f"propuesta_resolucion debe ser {' o '.join(cls.DECISIONES)}")
+        return propuesta
+
+    def columnas(self):
+        # Mismo orden que COLUMNAS_PROPUESTA
+        return [self.propuesta_resolucion, self.resolucion, self.monto_beca, self.motivo_caso, self.documentos]
+
+    def a_json(self):
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "propuesta_resolucion",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "propuesta_resolucion": {"type": "string", "enum": list(Propuesta.DECISIONES)},
+                "resolucion": {"type": "string"},
+                "monto_beca": {"type": "string"},
+                "motivo_caso": {"type": "string"},
+                "documentos": {"type": "string"},
+            },
+            "required": ["propuesta_resolucion", "resolucion", "monto_beca", "motivo_caso", "documentos"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+class GeneradorPropuestas:
+    """Genera las propuestas de varias filas en paralelo, con caché por prompt.
+
+    Antes de llamar al modelo se aplican las reglas deterministas (`reglas`);
+    las filas que ellas deciden no generan solicitud. Las respuestas se piden
+    con esquema JSON y se validan; una respuesta inválida se vuelve a pedir
+    hasta `max_reintentos_formato` veces. Los reintentos con backoff ante
+    errores de la API los hace el cliente de OpenAI (`max_retries`); si se agotan, la
+    fila queda con `PROPUESTA_FALLIDA` como una respuesta inválida. Con
+    `compactador`, el análisis concatenado se reduce a su presupuesto de
+    tokens antes de armar el prompt.
+    """
+
+    def __init__(self, client, max_workers=8, max_retries=5, timeout=120, cache=None, modelo=MODELO_PROPUESTA,
+                 reglas=REGLAS_POR_DEFECTO, max_reintentos_formato=2, metrics=None, compactador=None):
+        self.client = client.with_options(max_retries=max_retries, timeout=timeout)
+        self.max_workers = max_workers
+        self.cache = cache
+        self.modelo = modelo
+        self.reglas = reglas
+        self.max_reintentos_formato = max_reintentos_formato
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        self.compactador = compactador
+        self.llamadas = 0
+        self.omitidas = 0
+        # Respuestas que no pasaron la validación y filas que se quedaron sin propuesta
+        self.malformadas = 0
+        self.fallidas = 0
+        self.lock = threading.Lock()
+
+    def _contar(self, atributo):
+        with self.lock:
+            setattr(self, atributo, getattr(self, atributo) + 1)
+
+    def _completar(self, mensajes, intento=0):
+        inicio = time.monotonic()
+        try:
+            completion = self.client.chat.completions.create(
+                model=self.modelo,
+                messages=mensajes,
+                response_format=RESPONSE_FORMAT
+            )
+        except openai.APIError:
+            self.metrics.record_request('proposal', latency=time.monotonic() - inicio,
+                                        payload_bytes=len(json.dumps(mensajes)), retries=intento, failed=True)
+            raise
+        self._contar('llamadas')
+        # Los reintentos por formato inválido cuentan como reintentos de la solicitud
+        self.metrics.record_request('proposal', latency=time.monotonic() - inicio,
+                                    payload_bytes=len(json.dumps(mensajes)), usage=completion.usage, retries=intento)
+
+        respuesta = (completion.choices[0].message.content or '').strip()
+        return respuesta
+
+    def _generar_fila(self, prompt):
+        mensajes = construir_mensajes(prompt)
+        key = None
+        if self.cache is not None:
+            key = cache_key({"model": self.modelo, "messages": mensajes, "response_format": RESPONSE_FORMAT})
+            respuesta = self.cache.get(key)
+            if respuesta is not None:
+                try:
+                    columnas = Propuesta.desde_json(respuesta).columnas()
+                    self.metrics.record_request('proposal', cache_hit=True)
+                    return columnas
+                except PropuestaInvalida:
+                    pass
+
+        conversacion = mensajes
+        for intento in range(self.max_reintentos_formato + 1):
+            try:
+                respuesta = self._completar(conversacion, intento)
+            except openai.APIError:
+                # El cliente ya agotó sus reintentos: la fila queda sin propuesta y se reintenta al retomar
+                break
+            try:
+                propuesta = Propuesta.desde_json(respuesta)
+            except PropuestaInvalida as e:
+                self._contar('malformadas')
+                # Se le muestra al modelo su respuesta y el error para que la corrija
+                conversacion = mensajes + [
+                    {"role": "assistant", "content": respuesta},
+                    {"role": "user", "content": f"La respuesta anterior no es válida ({e}). Responde nuevamente solo con el objeto JSON solicitado."}
+                ]
+                continue
+            if key is not None:
+                self.cache.put(key, propuesta.a_json())
+            return propuesta.columnas()
+
+        self._contar('fallidas')
+        return None
+
+    def generar(self, filas, checkpoint=None):
+        decididas = aplicar_reglas(filas, self.reglas, COLUMNAS_PROPUESTA) if self.reglas else None
+        pendientes = filas if decididas is None else filas.drop(index=decididas.index)
+        self.omitidas += len(filas) - len(pendientes)
+
+        # Las filas ya guardadas en el checkpoint de un trabajo anterior no se vuelven a generar
+        respuestas = {}
+        if checkpoint is not None:
+            for indice in pendientes.index:
+                guardada = checkpoint.get(indice)
+                if guardada is not None:
+                    respuestas[indice] = json.loads(guardada)
+            pendientes = pendientes.drop(index=list(respuestas))
+
+        def generar_fila(indice, fila):
+            # La compactación puede llamar al modelo de resumen: se hace en el hilo de la fila
+            if self.compactador is not None:
+                fila = dict(fila, **{'Análisis_concatenado': self.compactador.compactar(fila.get('Análisis_concatenado'))})
+            columnas = self._generar_fila(construir_prompt(fila))
+            if columnas is None:
+                return PROPUESTA_FALLIDA
+            if checkpoint is not None:
+                checkpoint.put(indice, json.dumps(columnas, ensure_ascii=False))
+            return columnas
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="propuestas") as executor:
+            completadas = executor.map(generar_fila, pendientes.index, pendientes.to_dict('records'))
+            for hechas, (indice, columnas) in enumerate(zip(pendientes.index, completadas), start=1):
+                respuestas[indice] = columnas
+                self.metrics.set_progress('proposal', hechas, len(pendientes))
+
+        # Se devuelve en el orden de las filas, necesario para el concat con el DataFrame
+        resultados = []
+        for indice in filas.index:
+            if indice in respuestas:
+                resultados.append(respuestas[indice])
+            else:
+                resultados.append([str(valor) for valor in decididas.loc[indice, COLUMNAS_PROPUESTA]])
+        return resultados
@@ -0,0 +1,82 @@
+import json
+import operator
+
+import pandas as pd
+
+OPERADORES = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Reglas duras del prompt de propuestas que no necesitan al modelo para decidirse
+REGLAS_POR_DEFECTO = [
+    {
+        "columna": "PPE",
+        "operador": "<",
+        "valor": 0.5,
+        "resolucion": "Rechazada",
+        "justificacion": "La solicitud de beca se rechaza porque el PPE ({valor}) es menor a 0.5 y no cumple con el requisito mínimo.",
+    },
+    {
+        "columna": "Deuda vencida en sistema",
+        "operador": "==",
+        "valor": 0,
+        "resolucion": "Rechazada",
+        "justificacion": "La solicitud de beca se rechaza porque la deuda vencida en el sistema es 0 y no hay deuda a cubrir.",
+    },
+]
+
+MONTO_RECHAZO = "No aplica"
+DOCUMENTOS_RECHAZO = "No revisados (resolución automática)"
+
+
+def cargar_reglas(path=None):
+    if not path:
+        return REGLAS_POR_DEFECTO
+    with open(path, encoding='utf-8') as f:
+        reglas = json.load(f)
+    for regla in reglas:
+        if regla.get('operador') not in OPERADORES:
+            raise ValueError(f"Operador no soportado en regla: {regla.get('operador')}")
+    return reglas
+
+
+def aplicar_reglas(df, reglas=REGLAS_POR_DEFECTO, columnas=None):
+    """Evalúa las reglas sobre todo el DataFrame de una vez.
+
+    Devuelve un DataFrame con las columnas de propuesta solo para las filas
+    decididas (mismo índice que `df`). La primera regla que se cumple gana;
+    los valores faltantes o no numéricos nunca deciden una fila.
+    """
+    columnas = columnas or ["Propuesta Resolución", "RESOLUCIÓN", "MONTO DE LA BECA", "MOTIVO DEL CASO", "DOCUMENTOS"]
+    decididas = pd.Series(False, index=df.index)
+    resolucion = pd.Series('', index=df.index, dtype=object)
+    justificacion = pd.Series('', index=df.index, dtype=object)
+
+    for regla in reglas:
+        if regla['columna'] not in df.columns:
+            continue
+        valores = pd.to_numeric(df[regla['columna']], errors='coerce')
+        cumple = OPERADORES[regla['operador']](valores, regla['valor']).fillna(False) & valores.notna() & ~decididas
+        if not cumple.any():
+            continue
+        resolucion[cumple] = regla['resolucion']
+        justificacion[cumple] = valores[cumple].map(lambda v, plantilla=regla['justificacion']: plantilla.format(valor=v))
+        decididas |= cumple
+
+    if not decididas.any():
+        return pd.DataFrame(columns=columnas)
+
+    motivo = df.get('Motivo solicitud.', pd.Series('', index=df.index)).fillna('').astype(str)
+    resultado = pd.DataFrame({
+        columnas[0]: resolucion[decididas],
+        columnas[1]: justificacion[decididas],
+        columnas[2]: MONTO_RECHAZO,
+        columnas[3]: "Se informa lo siguiente: >" + motivo[decididas].str.strip() + ".",
+        columnas[4]: DOCUMENTOS_RECHAZO,
+    }, index=df.index[decididas])
+    return resultado
@@ -0,0 +1,215 @@
+import io
+import time
+from dataclasses import dataclass, asdict
+
+import fitz  # PyMuPDF
+from PIL import Image as PILImage, ImageChops, ImageStat
+
+FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+
+class PageRenderer:
+    """Renderiza páginas de PDF directamente a bytes en memoria.
+
+    Reutiliza el mismo buffer entre páginas y no escribe nada en disco.
+    """
+
+    def __init__(self, fmt='png', quality=85, dpi=72):
+        fmt = fmt.lower()
+        if fmt == 'jpg':
+            fmt = 'jpeg'
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato de imagen no soportado: {fmt}")
+        self.fmt = fmt
+        self.quality = quality
+        self.dpi = dpi
+        self.buffer = io.BytesIO()
+        # Segundos acumulados rasterizando y codificando
+        self.timings = {'render': 0.0, 'encode': 0.0}
+
+    @property
+    def mime(self):
+        return FORMATS[self.fmt][1]
+
+    def encode(self, pix, fmt=None, quality=None):
+        fmt = fmt or self.fmt
+        quality = quality or self.quality
+        started = time.perf_counter()
+        mode = "L" if pix.n == 1 else "RGB"
+        # frombuffer evita copiar las muestras del pixmap
+        img = PILImage.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        options = {} if fmt == 'png' else {"quality": quality}
+        img.save(self.buffer, format=FORMATS[fmt][0], **options)
+        data = self.buffer.getvalue()
+        self.timings['encode'] += time.perf_counter() - started
+        return data
+
+    def render(self, page):
+        started = time.perf_counter()
+        pix = page.get_pixmap(dpi=self.dpi, alpha=False)
+        self.timings['render'] += time.perf_counter() - started
+        return self.encode(pix)
+
+
+@dataclass
+class PayloadStats:
+    document: str
+    page: int
+    bytes_before: int
+    bytes_after: int
+    dpi: int
+    grayscale: bool
+    fmt: str
+    quality: int
+    cropped: bool
+
+    def as_dict(self):
+        return asdict(self)
+
+
+class PayloadOptimizer:
+    """Elige DPI, escala de grises y calidad por página para respetar un presupuesto.
+
+    Se usa en lugar de PageRenderer: expone la misma interfaz `render(page)`
+    y acumula en `stats` los bytes antes y después de optimizar cada página.
+    "Antes" es la primera codificación de la escalera (mayor DPI y calidad);
+    con `measure_baseline`, es la página completa en PNG a 72 dpi.
+    """
+
+    THUMBNAIL_DPI = 24
+
+    def __init__(self, max_bytes=350 * 1024, max_pixels=2_000_000, fmt='jpeg',
+                 dpi_ladder=(150, 110, 72, 50), quality_ladder=(85, 70, 55, 40),
+                 crop_margins=True, grayscale='auto', measure_baseline=False):
+        self.renderer = PageRenderer(fmt)
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.dpi_ladder = dpi_ladder
+        self.quality_ladder = quality_ladder if self.renderer.fmt != 'png' else (None,)
+        self.crop_margins = crop_margins
+        self.grayscale = grayscale
+        self.measure_baseline = measure_baseline
+        self.baseline = PageRenderer('png', dpi=72)
+        self.stats = []
+
+    @property
+    def mime(self):
+        return self.renderer.mime
+
+    @property
+    def timings(self):
+        return self.renderer.timings
+
+    def _inspect(self, page):
+        # Una miniatura barata decide si la página es en color y dónde está el contenido
+        pix = page.get_pixmap(dpi=self.THUMBNAIL_DPI, alpha=False)
+        thumb = PILImage.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+
+        grayscale = self.grayscale
+        if grayscale == 'auto':
+            r, g, b = thumb.split()
+            spread = max(ImageStat.Stat(ImageChops.difference(r, g)).mean[0],
+                         ImageStat.Stat(ImageChops.difference(g, b)).mean[0])
+            grayscale = spread < 4
+
+        clip = None
+        if self.crop_margins:
+            ink = ImageChops.invert(thumb.convert("L")).point(lambda v: 255 if v > 24 else 0)
+            bbox = ink.getbbox()
+            if bbox is not None:
+                rect = page.rect
+                sx, sy = rect.width / pix.width, rect.height / pix.height
+                pad = 2
+                clip = fitz.Rect(rect.x0 + max(0, bbox[0] - pad) * sx, rect.y0 + max(0, bbox[1] - pad) * sy,
+                                 rect.x0 + min(pix.width, bbox[2] + pad) * sx, rect.y0 + min(pix.height, bbox[3] + pad) * sy)
+                if clip.get_area() >= rect.get_area() * 0.95:
+                    clip = None
+        return bool(grayscale), clip
+
+    def render(self, page):
+        started = time.perf_counter()
+        encoding = self.timings['encode']
+        grayscale, clip = self._inspect(page)
+        area = clip if clip is not None else page.rect
+        colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+
+        data, used_dpi, used_quality, first_bytes = None, None, None, None
+        for i, dpi in enumerate(self.dpi_ladder):
+            last_dpi = i == len(self.dpi_ladder) - 1
+            pixels = (area.width * dpi / 72) * (area.height * dpi / 72)
+            if pixels > self.max_pixels and not last_dpi:
+                continue
+            pix = page.get_pixmap(dpi=dpi, colorspace=colorspace, clip=clip, alpha=False)
+            for quality in self.quality_ladder:
+                data = self.renderer.encode(pix, quality=quality)
+                used_dpi, used_quality = dpi, quality
+                if first_bytes is None:
+                    first_bytes = len(data)
+                if len(data) <= self.max_bytes:
+                    break
+            if len(data) <= self.max_bytes:
+                break
+
+        # Medir el tamaño sin optimizar cuesta otro render completo: solo si se pide
+        bytes_before = len(self.baseline.render(page)) if self.measure_baseline else first_bytes
+        # El tiempo de rasterizar (incluida la medición) es el total menos lo que tomó codificar
+        self.timings['render'] += time.perf_counter() - started - (self.timings['encode'] - encoding)
+        self.stats.append(PayloadStats(page.parent.name, page.number, bytes_before, len(data), used_dpi,
+                                       grayscale, self.renderer.fmt, used_quality, clip is not None))
+        return data
+
+
+class PageClassifier:
+    """Decide si una página tiene capa de texto suficiente para evitar la visión.
+
+    Una página es de texto cuando trae al menos `min_chars` caracteres
+    extraíbles y sus imágenes cubren menos de `max_image_coverage` del área.
+    """
+
+    def __init__(self, min_chars=200, max_image_coverage=0.35):
+        self.min_chars = min_chars
+        self.max_image_coverage = max_image_coverage
+
+    def image_coverage(self, page):
+        page_area = page.rect.get_area()
+        if not page_area:
+            return 0.0
+        covered = 0.0
+        for info in page.get_image_info():
+            bbox = fitz.Rect(info['bbox']) & page.rect
+            covered += bbox.get_area()
+        return min(1.0, covered / page_area)
+
+    def classify(self, page):
+        text = page.get_text("text").strip()
+        if len(text) >= self.min_chars and self.image_coverage(page) < self.max_image_coverage:
+            return 'text', text
+        return 'image', None
+
+
+def iter_page_routes(pdf_document, renderer, classifier=None):
+    # Las páginas de texto no se rasterizan; solo las escaneadas pasan por el renderer
+    for page in pdf_document:
+        if classifier is not None:
+            route, text = classifier.classify(page)
+            if route == 'text':
+                yield 'text', page.number, text
+                continue
+        yield 'image', page.number, renderer.render(page)
+
+
+# Un PDF dañado falla al abrirse o al renderizar una página; en versiones antiguas de PyMuPDF es un RuntimeError
+PDF_ERRORS = (fitz.FileDataError, RuntimeError)
+
+
+def open_pdf(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
@@ -0,0 +1,282 @@
+"""Ejecución sin interfaz del pipeline de revisión de documentos.
+
+    python revdoc.py run --zip cohorte.zip --excel estudiantes.xlsx --out salida/
+
+Las etapas corren como un pipeline productor/consumidor: las páginas se
+renderizan en un pool de procesos, se analizan en el pool de hilos del
+motor de visión y cada carpeta terminada pasa a generación de propuestas y
+a los escritores de salida. Colas acotadas limitan la memoria en uso. Las
+filas se escriben en el orden en que terminan, no en el del Excel.
+"""
+import os
+import sys
+import time
+import queue
+import zipfile
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+import pandas as pd
+from openai import OpenAI
+
+from vision import CHAT_COMPLETIONS_URL
+from propuestas import COLUMNAS_PROPUESTA
+from render import iter_page_routes, open_pdf, PDF_ERRORS
+from ingest import scan_zip, read_member
+from writers import ExcelStreamWriter, DeckStreamWriter
+from metrics import RunMetrics
+from pipeline import (ConsoleReporter, PageSubmitter, make_renderer, make_classifier, make_engine,
+                      make_generador, read_students_excel, name_payload_stats, report_ingest,
+                      report_analysis, report_propuestas, report_metrics, report_dedup, make_dedup)
+from dedup import collapse_repeats
+
+FIN = object()
+
+_worker_renderer = None
+_worker_classifier = None
+
+
+def render_pdf(data, name):
+    # Corre en un proceso del pool; el renderer se crea una vez por proceso
+    global _worker_renderer, _worker_classifier
+    if _worker_renderer is None:
+        _worker_renderer = make_renderer()
+        _worker_classifier = make_classifier()
+    with open_pdf(data) as pdf_document:
+        pages = list(iter_page_routes(pdf_document, _worker_renderer, _worker_classifier))
+    name_payload_stats(_worker_renderer, 0, name)
+    stats = getattr(_worker_renderer, 'stats', [])
+    drained, stats[:] = list(stats), []
+    timings = dict(_worker_renderer.timings)
+    for name in timings:
+        _worker_renderer.timings[name] = 0.0
+    return pages, drained, timings
+
+
+class StagePipeline:
+    def __init__(self, args, api_key, reporter):
+        self.args = args
+        self.api_key = api_key
+        self.reporter = reporter
+        self.errors = []
+        self.metrics = RunMetrics(listeners=[reporter.live])
+        self.stop = threading.Event()
+        self.analysis_queue = queue.Queue(maxsize=args.queue_size)
+        self.proposal_queue = queue.Queue(maxsize=args.queue_size)
+
+    def put(self, q, item):
+        # Si otra etapa falló, no quedarse bloqueado esperando espacio en la cola
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise RuntimeError("Pipeline detenido por un error en otra etapa")
+
+    def get(self, q):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        raise RuntimeError("Pipeline detenido por un error en otra etapa")
+
+    def thread(self, target, *args):
+        def run():
+            try:
+                target(*args)
+            except BaseException as e:
+                self.errors.append(e)
+                self.stop.set()
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        return worker
+
+    def collect_analyses(self, students, analysis_writer):
+        # Espera las páginas de cada carpeta y emite sus filas del Excel con el análisis
+        rows_by_folder = {folder: group.to_dict('records') for folder, group in students.groupby('Folder', sort=False)}
+        seen = set()
+        while True:
+            item = self.get(self.analysis_queue)
+            if item is FIN:
+                break
+            folder, pdf_futures = item
+            started = time.perf_counter()
+            # Las páginas repetidas de la carpeta aparecen una sola vez en el análisis
+            analyses = collapse_repeats(future.result() for page_futures in pdf_futures for future in page_futures)
+            # Tiempo que esta etapa quedó esperando respuestas de visión
+            self.metrics.add_time('vision', time.perf_counter() - started)
+            seen.add(folder)
+            for record in rows_by_folder.get(folder, []):
+                row = dict(record, **{'Análisis_concatenado': " ".join(analyses)})
+                analysis_writer.append(row)
+                self.put(self.proposal_queue, row)
+
+        # Estudiantes sin carpeta de PDFs: igual que el left join, quedan sin análisis
+        for folder, records in rows_by_folder.items():
+            if folder not in seen:
+                for record in records:
+                    row = dict(record, **{'Análisis_concatenado': None})
+                    analysis_writer.append(row)
+                    self.put(self.proposal_queue, row)
+        self.put(self.proposal_queue, FIN)
+
+    def generate_proposals(self, generador, result_writer, deck_writer):
+        done = False
+        while not done:
+            batch = []
+            item = self.get(self.proposal_queue)
+            # Micro-lotes: lo que ya esté en la cola se genera junto, en paralelo
+            while True:
+                if item is FIN:
+                    done = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.args.proposal_batch:
+                    break
+                try:
+                    item = self.proposal_queue.get_nowait()
+                except queue.Empty:
+                    break
+            if not batch:
+                continue
+            filas = pd.DataFrame(batch)
+            started = time.perf_counter()
+            generadas = generador.generar(filas)
+            self.metrics.add_time('proposal', time.perf_counter() - started)
+            for row, columnas in zip(batch, generadas):
+                row = dict(row, **dict(zip(COLUMNAS_PROPUESTA, columnas)))
+                result_writer.append(row)
+                started = time.perf_counter()
+                deck_writer.append(row)
+                self.metrics.add_time('slides', time.perf_counter() - started)
+            self.reporter.write(f"Propuestas escritas: {result_writer.rows}")
+
+    def produce(self, zip_ref, members, engine, pool, payload_stats):
+        # Ventana deslizante de PDFs en render: acota los PDFs y páginas en memoria
+        submitter = PageSubmitter(engine, make_renderer().mime, make_dedup(self.metrics))
+        window = deque()
+        current_folder, current_pdfs = None, []
+
+        def handle(folder, name, future):
+            nonlocal current_folder, current_pdfs
+            if folder != current_folder:
+                # Los lotes de imágenes nunca mezclan carpetas
+                submitter.flush()
+                if current_folder is not None:
+                    self.put(self.analysis_queue, (current_folder, current_pdfs))
+                current_folder, current_pdfs = folder, []
+            try:
+                pages, stats, timings = future.result()
+            except PDF_ERRORS as e:
+                # Un PDF dañado se omite; el resto de la cohorte se sigue procesando
+                report_ingest(self.reporter, [(name, f"PDF dañado o ilegible ({e})")], [])
+                return
+            payload_stats.extend(stats)
+            for name, seconds in timings.items():
+                self.metrics.add_time(name, seconds)
+            current_pdfs.append(submitter.submit_pages(pages, folder))
+
+        for member in members:
+            self.reporter.write(f"Processing {member.name}...")
+            started = time.perf_counter()
+            data = read_member(zip_ref, member, config.ZIP_LIMITS)
+            self.metrics.add_time('unzip', time.perf_counter() - started)
+            window.append((member.folder, member.name, pool.submit(render_pdf, data, member.name)))
+            if len(window) >= self.args.render_workers * 2:
+                handle(*window.popleft())
+            if self.stop.is_set():
+                raise RuntimeError("Pipeline detenido por un error en otra etapa")
+        while window:
+            handle(*window.popleft())
+        submitter.flush()
+        if current_folder is not None:
+            self.put(self.analysis_queue, (current_folder, current_pdfs))
+        self.put(self.analysis_queue, FIN)
+        return submitter
+
+    def run(self, zip_path, excel_path, out_dir, client, endpoint):
+        os.makedirs(out_dir, exist_ok=True)
+        students = read_students_excel(excel_path)
+        analysis_writer = ExcelStreamWriter(os.path.join(out_dir, "excel_con_analisis.xlsx"),
+                                            list(students.columns) + ['Análisis_concatenado'])
+        result_writer = ExcelStreamWriter(os.path.join(out_dir, "resultado_final.xlsx"),
+                                          list(students.columns) + ['Análisis_concatenado'] + COLUMNAS_PROPUESTA)
+        deck_writer = DeckStreamWriter(os.path.join(out_dir, "presentacion_estudiantes.pptx"))
+        vision_cache = config.open_vision_cache()
+        propuesta_cache = config.open_propuesta_cache()
+        generador = make_generador(client, propuesta_cache, self.metrics)
+        payload_stats = []
+
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            with self.metrics.stage('unzip'):
+                members, rechazados, advertencias = scan_zip(zip_ref, config.ZIP_LIMITS)
+            report_ingest(self.reporter, rechazados, advertencias)
+
+            proposals = self.thread(self.generate_proposals, generador, result_writer, deck_writer)
+            with make_engine(self.api_key, vision_cache, endpoint, self.metrics) as engine, \
+                    ProcessPoolExecutor(max_workers=self.args.render_workers) as pool:
+                collector = self.thread(self.collect_analyses, students, analysis_writer)
+                try:
+                    submitter = self.produce(zip_ref, members, engine, pool, payload_stats)
+                except BaseException as e:
+                    # Detiene las demás etapas; el primer error registrado es el que se informa
+                    self.errors.append(e)
+                    self.stop.set()
+                collector.join()
+            proposals.join()
+
+        if self.errors:
+            raise self.errors[0]
+
+        with self.metrics.stage('save'):
+            analysis_writer.close()
+            result_writer.close()
+            deck_writer.close()
+
+        report_analysis(self.reporter, engine, submitter, payload_stats, vision_cache)
+        report_dedup(self.reporter, submitter)
+        report_propuestas(self.reporter, generador, result_writer.rows, propuesta_cache)
+        report_metrics(self.reporter, self.metrics)
+        self.metrics.export(out_dir)
+        self.reporter.success(f"Resultados en {out_dir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="revdoc", description="Revisión de documentos y propuestas de resolución")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Procesa un ZIP de PDFs y un Excel de estudiantes")
+    run.add_argument("--zip", required=True, help="ZIP con una carpeta por RUT")
+    run.add_argument("--excel", required=True, help="Excel con los datos de los estudiantes")
+    run.add_argument("--out", required=True, help="Directorio de salida")
+    run.add_argument("--base-url", default=None,
+                     help="URL base de la API compatible con OpenAI (por ejemplo un servidor de prueba local)")
+    run.add_argument("--render-workers", type=int, default=os.cpu_count() or 2,
+                     help="Procesos para renderizar páginas")
+    run.add_argument("--queue-size", type=int, default=64, help="Capacidad de las colas entre etapas")
+    run.add_argument("--proposal-batch", type=int, default=config.PROPUESTA_CONCURRENCY,
+                     help="Filas que se generan juntas en cada micro-lote de propuestas")
+
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        print("API Key no encontrada. Define OPENAI_API_KEY o configura el archivo .env.", file=sys.stderr)
+        return 1
+
+    endpoint = CHAT_COMPLETIONS_URL
+    if args.base_url:
+        endpoint = f"{args.base_url.rstrip('/')}/chat/completions"
+    client = OpenAI(api_key=api_key, base_url=args.base_url)
+
+    StagePipeline(args, api_key, ConsoleReporter()).run(args.zip, args.excel, args.out, client, endpoint)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
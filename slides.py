@@ -0,0 +1,267 @@
+import re
+import copy
+
+from pptx import Presentation
+from pptx.oxml.ns import qn
+from pptx.util import Inches, Pt
+from pptx.enum.text import PP_ALIGN
+from pptx.enum.shapes import MSO_SHAPE
+from pptx.dml.color import RGBColor
+
+
+def add_textbox(slide, left, top, width, height, text, font_size=Pt(14), bold=False, font_color=RGBColor(0, 0, 0), alignment=PP_ALIGN.LEFT):
+    textbox = slide.shapes.add_textbox(left, top, width, height)
+    text_frame = textbox.text_frame
+    p = text_frame.add_paragraph()
+    p.text = text
+    p.font.size = font_size
+    p.font.bold = bold
+    p.font.color.rgb = font_color
+    p.alignment = alignment
+
+def create_header_background(slide, left, top, width, height):
+    background = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, left, top, width, height)
+    background.fill.solid()
+    background.fill.fore_color.rgb = RGBColor(255, 192, 0)  # Light blue
+    background.line.color.rgb = RGBColor(142, 180, 227)  # Sky blue border
+
+def create_card(slide, left, top, width, height, title, subtitles, contents, image_path=None):
+    card = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, left, top, width, height)
+    card.fill.solid()
+    card.fill.fore_color.rgb = RGBColor(255, 255, 255)  # White
+    card.line.color.rgb = RGBColor(200, 200, 200)  # Light gray border
+
+    # Add title
+    title_box = slide.shapes.add_textbox(left + Inches(0.25), top + Inches(0.25), width - Inches(0.5), Inches(0.5))
+    title_box.text_frame.text = title
+    title_box.text_frame.paragraphs[0].font.size = Pt(18)
+    title_box.text_frame.paragraphs[0].font.bold = True
+
+    # Add subtitles and contents
+    content_top = top + Inches(0.75)
+    for subtitle, content in zip(subtitles, contents):
+        subtitle_box = slide.shapes.add_textbox(left + Inches(0.25), content_top, width - Inches(0.5), Inches(0.3))
+        subtitle_box.text_frame.text = subtitle
+        subtitle_box.text_frame.paragraphs[0].font.size = Pt(14)
+        subtitle_box.text_frame.paragraphs[0].font.bold = True
+        content_top += Inches(0.3)
+
+        content_box = slide.shapes.add_textbox(left + Inches(0.25), content_top, width - Inches(0.5), Inches(1))
+        content_box.text_frame.word_wrap = True
+        if isinstance(content, str):
+            content_box.text_frame.text = content
+        else:
+            content_box.text_frame.text = str(content)
+        for paragraph in content_box.text_frame.paragraphs:
+            paragraph.font.size = Pt(12)
+        content_top += Inches(1)
+
+def create_button(slide, left, top, width, height, text, color):
+    button = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, left, top, width, height)
+    button.fill.solid()
+    button.fill.fore_color.rgb = color
+    button.line.color.rgb = color
+    button.text_frame.text = text
+    button.text_frame.paragraphs[0].font.color.rgb = RGBColor(255, 255, 255)  # White text
+
+
+def slide_texts(row):
+    # Textos de la diapositiva de un estudiante, ya formateados
+    analisis = str(row.get('Análisis_concatenado', ''))
+    fuas_info = 'No especificado'
+    if 'Postulación FUAS:' in analisis:
+        fuas_info = analisis.split('Postulación FUAS:')[1].split('.')[0].strip()
+
+    return {
+        'nombre': f"{row.get('Nombre completo', 'N/A')}\n{row.get('Folder', 'N/A')}",
+        'carrera': f"{row.get('Carrera', 'N/A')}\n{row.get('Sede', 'N/A')}",
+        'matricula': f"MATRÍCULA 2024-1\nCON CURSOS: {row.get('Vigencia con cursos inscritos', 'N/A')}",
+        'ingreso': f"Ingresa: {row.get('Año y Semestre de ingreso', 'N/A')}",
+        'envio': f"Envía Solicitud: {row.get('Hora de inicio', 'N/A')}",
+        'motivo': str(row.get('Motivo solicitud.', 'N/A')),
+        'motivo_caso': str(row.get('MOTIVO DEL CASO', 'No hay información disponible')),
+        'documentos': str(row.get('DOCUMENTOS', 'No hay información disponible')),
+        'economicos': f"Beneficio: {row.get('¿Ha recibido beneficios anteriormente? ¿Cuál?', 'N/A')}\n"
+                      f"Deuda: ${'{:,}'.format(row.get('Deuda vencida en sistema', 0.0))}\n"
+                      f"Postulación a FUAS: {fuas_info}\n"
+                      f"Arancel: ${'{:,}'.format(row.get('Monto cuota de Arancel', 0.0))}\n"
+                      f"Matrícula: ${'{:,}'.format(row.get('Monto valor de matrícula', 0.0))}",
+        'academicos': f"Avance Curricular: {row.get('Avance curricular (%)', 'N/A')}\n"
+                      f"PPS: {row.get('PPS', 'N/A')}\n"
+                      f"RSH: {row.get('Registro Social de Hogares (RSH) o Nivel Socioeconómico (NSE)', 'N/A')}\n"
+                      f"Promedio Ponderado Evaluación: {'{:.2f}'.format(row.get('PPE', 0.0))}",
+        # Extract resolution information safely
+        'resolucion': str(row.get('RESOLUCIÓN', 'No hay información disponible')),
+        'monto': f"${'{:,}'.format(row.get('Plan de Retención', 0.0))}",
+    }
+
+
+def build_slide(prs, texts):
+    # Create slide
+    slide = prs.slides.add_slide(prs.slide_layouts[6])  # Blank layout
+
+    # Add header background
+    create_header_background(slide, Inches(0.25), Inches(0.2), Inches(12.9), Inches(1.6))
+
+    # Add header information
+    add_textbox(slide, Inches(0.5), Inches(0.2), Inches(4), Inches(0.5),
+                texts['nombre'], font_size=Pt(14), bold=True)
+
+    add_textbox(slide, Inches(5), Inches(0.2), Inches(4), Inches(0.5),
+                texts['carrera'], font_size=Pt(14), bold=True)
+
+    add_textbox(slide, Inches(9.5), Inches(0.2), Inches(3.5), Inches(0.5),
+                texts['matricula'], font_size=Pt(14), bold=True, alignment=PP_ALIGN.RIGHT)
+
+    # Add timeline
+    add_textbox(slide, Inches(0.7), Inches(1), Inches(2), Inches(0.3),
+                texts['ingreso'], font_size=Pt(10), font_color=RGBColor(255, 255, 255))
+
+    add_textbox(slide, Inches(10.5), Inches(1), Inches(2.5), Inches(0.3),
+                texts['envio'], font_size=Pt(10), font_color=RGBColor(255, 255, 255), alignment=PP_ALIGN.RIGHT)
+
+    # Create three cards
+    card_width = Inches(4)
+    card_height = Inches(5.3)
+    spacing = Inches(0.5)
+
+    # First card content
+    subtitles_list1 = ["MOTIVO", "MOTIVO DEL CASO","DOCUMENTOS"]
+    contents_list1 = [texts['motivo'], texts['motivo_caso'], texts['documentos']]
+
+    card_left = Inches(0.1) + 0 * (card_width + spacing)
+    card_top = Inches(2)
+    create_card(slide, card_left, card_top, card_width, card_height,
+                "SOLICITA", subtitles_list1, contents_list1)
+
+    subtitles_list2 = ["ANTECEDENTES ECONÓMICOS", "ANTECEDENTES ACADÉMICOS"]
+    contents_list2 = [texts['economicos'], texts['academicos']]
+
+    subtitles_list3 = ["RESOLUCIÓN", "MONTO DE LA BECA"]
+    contents_list3 = [texts['resolucion'], texts['monto']]
+
+    button_left = card_left + Inches(0.25)
+    button_top = card_top + card_height - Inches(0.7)
+    button_width = card_width - Inches(0.5)
+    button_height = Inches(0.5)
+    create_button(slide, button_left, button_top, button_width, button_height,
+                  "Solicitud", RGBColor(13, 34, 60))  # Indigo color
+
+    card_left = Inches(0.1) + 1 * (card_width + spacing)
+    create_card(slide, card_left, card_top, card_width, card_height,
+                "ANTECEDENTES", subtitles_list2, contents_list2)
+
+    button_left = card_left + Inches(0.25)
+    create_button(slide, button_left, button_top, button_width, button_height,
+                  "Revisión", RGBColor(13, 34, 60))  # Teal color
+
+    card_left = Inches(0.1) + 2 * (card_width + spacing)
+    create_card(slide, card_left, card_top, card_width, card_height,
+                "RESOLUCIÓN", subtitles_list3, contents_list3)
+
+    button_left = card_left + Inches(0.25)
+    create_button(slide, button_left, button_top, button_width, button_height,
+                  "Resolución", RGBColor(13, 34, 60))   # Blue color
+
+    return slide
+
+
+def create_slide_from_row(prs, row):
+    # Construcción forma por forma; SlideTemplate produce el mismo resultado clonando XML
+    return build_slide(prs, slide_texts(row))
+
+
+# Campos que add_textbox escribe en un solo párrafo (saltos de línea como <a:br/>);
+# el resto usa text_frame.text, que crea un párrafo por línea
+BREAK_FIELDS = {'nombre', 'carrera', 'matricula', 'ingreso', 'envio'}
+FIELDS = ['nombre', 'carrera', 'matricula', 'ingreso', 'envio', 'motivo', 'motivo_caso', 'documentos',
+          'economicos', 'academicos', 'resolucion', 'monto']
+CONTROL_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _token(field):
+    return f"⟦{field}⟧"
+
+
+class SlideTemplate:
+    """Diapositiva prototipo que se clona por fila rellenando solo sus textos.
+
+    El diseño (fondos, tarjetas, botones y formato) se construye una vez con
+    `build_slide` usando marcadores; cada fila copia el árbol XML del
+    prototipo y reemplaza los marcadores por el texto de la fila.
+    """
+
+    def __init__(self):
+        prs = new_presentation()
+        slide = build_slide(prs, {field: _token(field) for field in FIELDS})
+        self.tree = slide._element.cSld.spTree
+        self.tokens = {_token(field): field for field in FIELDS}
+
+    def _fill(self, text_element, field, value):
+        run = text_element.getparent()
+        paragraph = run.getparent()
+        lines = CONTROL_CHARS.sub('', value.replace('\r\n', '\n')).split('\n')
+
+        if field in BREAK_FIELDS:
+            position = paragraph.index(run)
+            paragraph.remove(run)
+            for i, line in enumerate(lines):
+                if i:
+                    paragraph.insert(position, paragraph.makeelement(qn('a:br'), {}))
+                    position += 1
+                if line:
+                    paragraph.insert(position, _make_run(paragraph, line))
+                    position += 1
+            return
+
+        # Un párrafo por línea, con las propiedades del párrafo del prototipo
+        body = paragraph.getparent()
+        position = body.index(paragraph)
+        body.remove(paragraph)
+        paragraph.remove(run)
+        for i, line in enumerate(lines):
+            new_paragraph = copy.deepcopy(paragraph)
+            if line:
+                new_paragraph.append(_make_run(new_paragraph, line))
+            body.insert(position + i, new_paragraph)
+
+    def render_tree(self, texts):
+        tree = copy.deepcopy(self.tree)
+        for text_element in list(tree.iter(qn('a:t'))):
+            field = self.tokens.get(text_element.text)
+            if field is not None:
+                self._fill(text_element, field, texts[field])
+        return tree
+
+    @staticmethod
+    def attach(prs, tree):
+        slide = prs.slides.add_slide(prs.slide_layouts[6])  # Blank layout
+        c_sld = slide._element.cSld
+        c_sld.replace(c_sld.spTree, tree)
+        return slide
+
+    def add_slide(self, prs, row):
+        return self.attach(prs, self.render_tree(slide_texts(row)))
+
+
+def _make_run(parent, text):
+    run = parent.makeelement(qn('a:r'), {})
+    text_element = run.makeelement(qn('a:t'), {})
+    text_element.text = text
+    run.append(text_element)
+    return run
+
+
+def new_presentation():
+    prs = Presentation()
+    prs.slide_width = Inches(13.33)
+    prs.slide_height = Inches(7.5)
+    return prs
+
+def create_presentation_from_dataframe(df, output_path):
+    # En un solo proceso: armar diapositivas en paralelo y unirlas como XML resultó más lento
+    prs = new_presentation()
+    template = SlideTemplate()
+    for row in df.to_dict('records'):
+        template.add_slide(prs, row)
+    prs.save(output_path)
@@ -0,0 +1,28 @@
+from compactacion import Compactador, parsear_analisis, elementos_priorizados, _limpiar
+
+
+def test_solo_los_marcadores_completos_son_valores_vacios():
+    for vacio in ["No aplica", "N/A", "Ninguno.", "No se observan", "Sin información"]:
+        assert _limpiar(vacio) is None
+    for dato in ["No se registran ingresos formales en el hogar", "No aplica. Monto líquido $450.000",
+                 "Ninguna enfermedad, pero cesantía del padre"]:
+        assert _limpiar(dato) == dato
+
+
+def test_campo_repetido_en_un_documento_conserva_sus_valores():
+    documentos, _ = parsear_analisis("Tipo de documento: Certificado\nFechas relevantes: 01/03/2024\n"
+                                     "Fechas relevantes: 05/06/2024\n")
+    assert documentos == [{'tipo': 'Certificado', 'fechas': '01/03/2024; 05/06/2024'}]
+
+
+def test_fechas_y_emisores_iguales_se_conservan_en_cada_documento():
+    documentos = [{'tipo': 'Liquidación', 'fechas': '01/2024', 'institucion': 'AFP', 'resumen': 'Cesantía'},
+                  {'tipo': 'Finiquito', 'fechas': '01/2024', 'institucion': 'AFP', 'resumen': 'Cesantía'}]
+    textos = [texto for _, texto in elementos_priorizados(documentos, [])]
+    assert sum("Fechas relevantes: 01/2024" in texto for texto in textos) == 2
+    assert sum("Resumen de la carta: Cesantía" in texto for texto in textos) == 1
+
+
+def test_texto_que_cabe_no_se_reescribe():
+    texto = "Tipo de documento: Carta\nResumen de la carta: El padre quedó cesante en marzo."
+    assert Compactador(presupuesto=1200).compactar(texto) is texto
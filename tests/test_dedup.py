@@ -0,0 +1,80 @@
+import io
+
+from PIL import Image as PILImage, ImageChops, ImageDraw
+
+from dedup import PageDeduplicator, dhash
+
+
+def pagina(nombre, compress_level=6):
+    # Misma plantilla (encabezado, recuadros) con los datos de un estudiante
+    img = PILImage.new('RGB', (600, 800), 'white')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 599, 80), fill=(30, 60, 120))
+    draw.text((20, 30), "CARTOLA REGISTRO SOCIAL DE HOGARES", fill='white')
+    for top in range(120, 700, 120):
+        draw.rectangle((20, top, 579, top + 90), outline='black', width=2)
+    draw.text((40, 140), f"Nombre: {nombre}", fill='black')
+    draw.text((40, 260), "Tramo: 40%", fill='black')
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG', compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def distancia(a, b):
+    return (dhash(PILImage.open(io.BytesIO(a))) ^ dhash(PILImage.open(io.BytesIO(b)))).bit_count()
+
+
+def deduplicador(a, b):
+    # El umbral cubre la distancia real entre ambas páginas: la confirmación por píxeles decide
+    return PageDeduplicator(perceptual=True, max_distance=max(6, distancia(a, b)))
+
+
+def test_misma_plantilla_con_otros_datos_no_comparte_analisis():
+    a, b = pagina("Ana María Pérez Soto"), pagina("Luis Alberto Rojas Díaz")
+    dedup = deduplicador(a, b)
+    primero = dedup.image(a, lambda _: object(), 'estudiante_1')
+    segundo = dedup.image(b, lambda _: object(), 'estudiante_1')
+    assert primero is not segundo
+    assert dedup.near == 0
+
+
+def test_misma_pagina_recodificada_en_la_carpeta_se_comparte():
+    a, b = pagina("Ana María Pérez Soto", 1), pagina("Ana María Pérez Soto", 9)
+    assert a != b
+    dedup = deduplicador(a, b)
+    primero = dedup.image(a, lambda _: object(), 'estudiante_1')
+    assert dedup.image(b, lambda _: object(), 'estudiante_1') is primero
+    assert dedup.near == 1
+
+
+def test_casi_identicas_en_otra_carpeta_no_se_comparten():
+    a, b = pagina("Ana María Pérez Soto", 1), pagina("Ana María Pérez Soto", 9)
+    dedup = deduplicador(a, b)
+    primero = dedup.image(a, lambda _: object(), 'estudiante_1')
+    assert dedup.image(b, lambda _: object(), 'estudiante_2') is not primero
+
+
+def test_identicas_se_comparten_entre_carpetas():
+    a = pagina("Ana María Pérez Soto")
+    dedup = PageDeduplicator()
+    primero = dedup.image(a, lambda _: object(), 'estudiante_1')
+    assert dedup.image(a, lambda _: object(), 'estudiante_2') is primero
+
+
+def reescaneo(data):
+    # Segundo escaneo del mismo papel: desplazado, con ruido y en JPEG
+    img = PILImage.open(io.BytesIO(data)).convert('L').rotate(0.3, fillcolor=255).transform(
+        (600, 800), PILImage.AFFINE, (1, 0, -3, 0, 1, -2), fillcolor=255)
+    img = ImageChops.add(img, PILImage.effect_noise(img.size, 8), 1, -128)
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=75)
+    return buffer.getvalue()
+
+
+def test_un_reescaneo_no_se_confirma_como_duplicado():
+    # Límite conocido: el ruido de un reescaneo supera la diferencia entre dos estudiantes con la misma plantilla
+    a = pagina("Ana María Pérez Soto")
+    b = reescaneo(a)
+    dedup = deduplicador(a, b)
+    primero = dedup.image(a, lambda _: object(), 'estudiante_1')
+    assert dedup.image(b, lambda _: object(), 'estudiante_1') is not primero
@@ -0,0 +1,53 @@
+import io
+import zipfile
+
+import pytest
+
+from ingest import scan_zip, ZipLimits, ZipIngestError
+
+PDF = b"%PDF-1.4 contenido de prueba " * 4
+
+
+def zip_con(miembros, compresion=zipfile.ZIP_STORED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compresion) as zf:
+        for nombre, datos in miembros.items():
+            zf.writestr(nombre, datos)
+    buffer.seek(0)
+    return zipfile.ZipFile(buffer)
+
+
+def test_estructura_valida_ordenada_por_carpeta():
+    zf = zip_con({"cohorte/15000000-9/b.pdf": PDF, "cohorte/12345678/a.pdf": PDF, "cohorte/12345678/notas.txt": b"x",
+                  "__MACOSX/cohorte/12345678/._a.pdf": PDF, "cohorte/sin_rut/c.pdf": PDF})
+    pdfs, rechazados, advertencias = scan_zip(zf)
+    assert [(m.folder, m.name) for m in pdfs] == [("12345678", "cohorte/12345678/a.pdf"),
+                                                  ("15000000-9", "cohorte/15000000-9/b.pdf"),
+                                                  ("sin_rut", "cohorte/sin_rut/c.pdf")]
+    assert rechazados == []
+    assert advertencias == ["sin_rut"]
+
+
+def test_rutas_fuera_del_zip_y_pdfs_sueltos_se_rechazan():
+    zf = zip_con({"../12345678/a.pdf": PDF, "/12345678/b.pdf": PDF, "suelto.pdf": PDF, "12345678/ok.pdf": PDF})
+    pdfs, rechazados, _ = scan_zip(zf)
+    assert [m.name for m in pdfs] == ["12345678/ok.pdf"]
+    assert dict(rechazados) == {"../12345678/a.pdf": "ruta no permitida", "/12345678/b.pdf": "ruta no permitida",
+                                "suelto.pdf": "el PDF no está dentro de una carpeta con el RUT"}
+
+
+def test_tasa_de_compresion_sospechosa_rechaza_el_zip():
+    zf = zip_con({"12345678/bomba.pdf": b"\0" * (1024 * 1024)}, zipfile.ZIP_DEFLATED)
+    with pytest.raises(ZipIngestError, match="compresión"):
+        scan_zip(zf)
+
+
+def test_limites_de_tamano_y_cantidad():
+    zf = zip_con({"12345678/a.pdf": PDF, "12345678/b.pdf": PDF})
+    with pytest.raises(ZipIngestError, match="descomprimido"):
+        scan_zip(zf, ZipLimits(max_member_bytes=len(PDF) - 1))
+    with pytest.raises(ZipIngestError, match="supera"):
+        scan_zip(zf, ZipLimits(max_total_bytes=len(PDF) + 1))
+    with pytest.raises(ZipIngestError, match="archivos"):
+        scan_zip(zf, ZipLimits(max_members=1))
+
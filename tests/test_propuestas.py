@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from propuestas import Propuesta, PropuestaInvalida, COLUMNAS_PROPUESTA
+
+
+def respuesta(**cambios):
+    datos = {
+        "propuesta_resolucion": "Aprobada",
+        "resolucion": "Se aprueba la solicitud del estudiante RUT 12.345.678-9 - deuda vencida de $350.000.",
+        "monto_beca": "Monto a determinar según normativa",
+        "motivo_caso": "Se informa lo siguiente: >Padre cesante - sin ingresos. >Postulación FUAS: octubre de 2022.",
+        "documentos": "Carta de solicitud de beca; Registro Social de Hogares",
+    }
+    datos.update(cambios)
+    return json.dumps(datos, ensure_ascii=False)
+
+
+def test_guiones_y_rut_se_conservan_en_cada_campo():
+    columnas = Propuesta.desde_json(respuesta()).columnas()
+    assert len(columnas) == len(COLUMNAS_PROPUESTA)
+    assert "12.345.678-9 - deuda" in columnas[1]
+    assert columnas[3].startswith("Se informa lo siguiente: >Padre cesante - sin ingresos.")
+
+
+def test_ida_y_vuelta_por_json():
+    propuesta = Propuesta.desde_json(respuesta())
+    assert Propuesta.desde_json(propuesta.a_json()) == propuesta
+
+
+@pytest.mark.parametrize("contenido", [
+    "Propuesta Resolución - Aprobada - ...",
+    "[]",
+    respuesta(documentos="  "),
+    respuesta(monto_beca=350000),
+    respuesta(propuesta_resolucion="Aprobada parcialmente"),
+    json.dumps({"propuesta_resolucion": "Rechazada"}),
+])
+def test_respuestas_invalidas(contenido):
+    with pytest.raises(PropuestaInvalida):
+        Propuesta.desde_json(contenido)
@@ -0,0 +1,36 @@
+import pandas as pd
+
+from reglas import aplicar_reglas, MONTO_RECHAZO
+
+
+def filas(**columnas):
+    datos = {'PPE': [0.8], 'Deuda vencida en sistema': [100000], 'Motivo solicitud.': ["Cesantía"]}
+    datos.update(columnas)
+    return pd.DataFrame(datos)
+
+
+def test_la_primera_regla_que_se_cumple_gana():
+    decididas = aplicar_reglas(filas(PPE=[0.3], **{'Deuda vencida en sistema': [0]}))
+    assert list(decididas.index) == [0]
+    assert "PPE (0.3)" in decididas.loc[0, "RESOLUCIÓN"]
+    assert decididas.loc[0, "Propuesta Resolución"] == "Rechazada"
+    assert decididas.loc[0, "MONTO DE LA BECA"] == MONTO_RECHAZO
+
+
+def test_solo_se_devuelven_las_filas_decididas_con_su_indice():
+    df = pd.DataFrame({'PPE': [0.8, 0.2, 0.9], 'Deuda vencida en sistema': [500, 500, 0],
+                       'Motivo solicitud.': ["a", "b", None]}, index=[10, 11, 12])
+    decididas = aplicar_reglas(df)
+    assert list(decididas.index) == [11, 12]
+    assert "deuda vencida" in decididas.loc[12, "RESOLUCIÓN"]
+    assert decididas.loc[12, "MOTIVO DEL CASO"] == "Se informa lo siguiente: >."
+
+
+def test_valores_faltantes_o_no_numericos_no_deciden():
+    df = pd.DataFrame({'PPE': [None, "sin dato", float('nan')],
+                       'Deuda vencida en sistema': [float('nan'), "pendiente", None]})
+    assert aplicar_reglas(df).empty
+
+
+def test_columna_ausente_se_ignora():
+    assert aplicar_reglas(pd.DataFrame({'Deuda vencida en sistema': [100]})).empty
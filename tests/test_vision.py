@@ -0,0 +1,34 @@
+import json
+
+from vision import split_batch_response
+
+
+def lote(*entradas):
+    return json.dumps({"paginas": list(entradas)})
+
+
+def test_entradas_desordenadas_se_devuelven_en_el_orden_de_las_imagenes():
+    contenido = lote({"pagina": 2, "analisis": "B"}, {"pagina": 1, "analisis": "A"}, {"pagina": 3, "analisis": "C"})
+    assert split_batch_response(contenido, 3) == ["A", "B", "C"]
+
+
+def test_sin_numero_de_pagina_se_usa_la_posicion():
+    assert split_batch_response(lote({"analisis": "A"}, {"analisis": "B"}), 2) == ["A", "B"]
+
+
+def test_analisis_estructurado_se_serializa():
+    assert split_batch_response(lote({"pagina": 1, "analisis": {"tipo": "Carta"}}), 1) == ['{"tipo": "Carta"}']
+
+
+def test_respuestas_que_no_calzan_con_el_lote():
+    for contenido, n in [
+        (lote({"pagina": 1, "analisis": "A"}), 2),                                 # falta una página
+        (lote({"pagina": 1, "analisis": "A"}, {"pagina": 1, "analisis": "B"}), 2),  # página repetida
+        (lote({"pagina": 1, "analisis": "A"}, {"pagina": 3, "analisis": "C"}), 2),  # fuera de rango
+        (lote({"pagina": "uno", "analisis": "A"}), 1),
+        (lote({"pagina": 1}), 1),
+        (json.dumps({"resultado": []}), 1),
+        ("no es json", 1),
+        (None, 1),
+    ]:
+        assert split_batch_response(contenido, n) is None
@@ -0,0 +1,430 @@
+import os
+import time
+import json
+import base64
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError
+
+import requests
+
+from cache import cache_key
+from metrics import RunMetrics
+
+# Endpoint configurable para poder apuntar a un servidor local de prueba
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
+CHAT_COMPLETIONS_URL = f"{OPENAI_BASE_URL}/chat/completions"
+
+VISION_MODEL = "gpt-4o-mini"
+VISION_MAX_TOKENS = 300
+VISION_PROMPT = "Eres un asistente virtual especializado en la revisión de documentos escaneados. Analiza la imagen adjunta y extrae la siguiente información de manera breve y estructurada:\n\n- Tipo de documento (incluyendo documentos de identidad)\n- Nombres completos\n- Fechas relevantes\n- Institución emisora\n- Diagnóstico médico (si aplica)\n- Firmas y sellos presentes\n- Resumen de la carta** (si el documento es una carta o contiene una carta, proporciona un resumen conciso de su contenido)\n\nAdjunto una imagen para que la revises."
+
+TEXT_MODEL = os.getenv('TEXT_MODEL', VISION_MODEL)
+TEXT_PROMPT = "Eres un asistente virtual especializado en la revisión de documentos. A continuación se incluye el texto extraído de un documento PDF digital. Extrae la siguiente información de manera breve y estructurada:\n\n- Tipo de documento (incluyendo documentos de identidad)\n- Nombres completos\n- Fechas relevantes\n- Institución emisora\n- Diagnóstico médico (si aplica)\n- Firmas y sellos presentes\n- Resumen de la carta** (si el documento es una carta o contiene una carta, proporciona un resumen conciso de su contenido)\n\nTexto del documento:"
+
+BATCH_PROMPT = "Eres un asistente virtual especializado en la revisión de documentos escaneados. Recibirás {n} imágenes numeradas, que pueden ser páginas de uno o varios documentos del mismo estudiante. Para cada imagen, extrae la siguiente información de manera breve y estructurada:\n\n- Tipo de documento (incluyendo documentos de identidad)\n- Nombres completos\n- Fechas relevantes\n- Institución emisora\n- Diagnóstico médico (si aplica)\n- Firmas y sellos presentes\n- Resumen de la carta** (si el documento es una carta o contiene una carta, proporciona un resumen conciso de su contenido)\n\nResponde únicamente con un objeto JSON con la forma {{\"paginas\": [{{\"pagina\": 1, \"analisis\": \"...\"}}]}}, con exactamente una entrada por imagen y en el mismo orden."
+
+ANALYSIS_FAILED = "Analysis failed"
+
+# Códigos que vale la pena reintentar: límite de tasa y errores del servidor
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class VisionAPIError(Exception):
+    def __init__(self, status_code, text, retry_after=None):
+        super().__init__(f"Error: {status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.status_code in RETRYABLE_STATUS
+
+
+class TokenBucket:
+    """Limitador de tasa compartido entre hilos (rate solicitudes/segundo)."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # Ante un 429 vaciamos el balde para que todos los hilos esperen
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+def image_payload(image_bytes, mime="image/png", detail=None, model=VISION_MODEL, prompt=VISION_PROMPT,
+                  max_tokens=VISION_MAX_TOKENS):
+    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+    image_url = {"url": f"data:{mime};base64,{base64_image}"}
+    if detail:
+        # "low", "high" o "auto": controla cuántos tokens de visión consume la imagen
+        image_url["detail"] = detail
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": image_url
+                    }
+                ]
+            }
+        ],
+        "max_tokens": max_tokens
+    }
+
+
+def batch_image_payload(images, mime="image/png", detail=None, model=VISION_MODEL,
+                        max_tokens_per_page=VISION_MAX_TOKENS):
+    # Un solo prompt para varias imágenes; cada una va precedida de su número
+    content = [{"type": "text", "text": BATCH_PROMPT.format(n=len(images))}]
+    for i, image_bytes in enumerate(images, start=1):
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+        image_url = {"url": f"data:{mime};base64,{base64_image}"}
+        if detail:
+            image_url["detail"] = detail
+        content.append({"type": "text", "text": f"Imagen {i}:"})
+        content.append({"type": "image_url", "image_url": image_url})
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": content
+            }
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": max_tokens_per_page * len(images)
+    }
+
+
+def split_batch_response(content, n):
+    # Devuelve un análisis por imagen, o None si la respuesta no calza con el lote
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    entries = data.get('paginas') if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        return None
+    analyses = {}
+    for position, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict) or 'analisis' not in entry:
+            return None
+        try:
+            index = int(entry.get('pagina', position))
+        except (TypeError, ValueError):
+            return None
+        analysis = entry['analisis']
+        analyses[index] = analysis if isinstance(analysis, str) else json.dumps(analysis, ensure_ascii=False)
+    if sorted(analyses) != list(range(1, n + 1)):
+        return None
+    return [analyses[i] for i in range(1, n + 1)]
+
+
+def text_payload(texts, model=TEXT_MODEL, prompt=TEXT_PROMPT, max_tokens=VISION_MAX_TOKENS):
+    # Varias páginas consecutivas del mismo documento van en una sola solicitud
+    pages = "\n\n".join(f"--- Página {i} ---\n{text}" for i, text in enumerate(texts, start=1))
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": f"{prompt}\n\n{pages}"
+            }
+        ],
+        "max_tokens": max_tokens
+    }
+
+
+def post_chat_completion(payload, api_key, session=None, endpoint=CHAT_COMPLETIONS_URL, timeout=60):
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+    post = session.post if session is not None else requests.post
+    response = post(endpoint, headers=headers, json=payload, timeout=timeout)
+
+    if response.status_code != 200:
+        retry_after = response.headers.get('Retry-After')
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+        raise VisionAPIError(response.status_code, response.text, retry_after)
+
+    response_data = response.json()
+    if 'error' in response_data:
+        raise VisionAPIError(response.status_code, response_data['error'].get('message', ''))
+
+    return response_data
+
+
+def extract_content(response_data):
+    if response_data and 'choices' in response_data and len(response_data['choices']) > 0:
+        return response_data['choices'][0]['message']['content']
+    return None
+
+
+def resolve_page(target, source, errors=None):
+    # Pasa el resultado de `source` a `target`; si la solicitud falló, la página queda como análisis fallido
+    error = CancelledError() if source.cancelled() else source.exception()
+    if error is not None:
+        if errors is not None:
+            errors.append(str(error) or type(error).__name__)
+        target.set_result(ANALYSIS_FAILED)
+    else:
+        target.set_result(source.result())
+
+
+class PageAnalysisEngine:
+    """Ejecuta llamadas de visión en paralelo con límite de tasa y reintentos.
+
+    `submit` devuelve un Future por página; el llamador conserva el orden
+    guardando los futures en la misma posición que las páginas.
+    """
+
+    def __init__(self, api_key, max_workers=8, requests_per_second=5.0, max_retries=5,
+                 timeout=60, backoff_base=1.0, backoff_max=30.0, endpoint=CHAT_COMPLETIONS_URL, cache=None,
+                 metrics=None):
+        self.api_key = api_key
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.endpoint = endpoint
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else RunMetrics()
+        # Errores definitivos; se muestran desde el hilo principal
+        self.errors = []
+        # Latencias por ruta ("image", "text", ...) para comparar costos
+        self.latencies = {}
+        self.bucket = TokenBucket(requests_per_second)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vision")
+        # Limita las páginas codificadas en memoria que esperan un hilo libre
+        self.pending = threading.BoundedSemaphore(max_workers * 2)
+        self.local = threading.local()
+
+    def _session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        # Backoff exponencial con jitter completo
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _run(self, payload, key=None, route=None, parse=None, bounded=True):
+        try:
+            started = time.monotonic()
+            content, usage, retries = self._call(payload)
+            latency = time.monotonic() - started
+            self.latencies.setdefault(route, []).append(latency)
+            self.metrics.record_request('vision', route=route, latency=latency, payload_bytes=len(json.dumps(payload)),
+                                        usage=usage, retries=retries, failed=content == ANALYSIS_FAILED)
+            # Una solicitud fallida no es lo mismo que una respuesta que no se pudo interpretar (None)
+            if content == ANALYSIS_FAILED:
+                return content
+            result = parse(content) if parse is not None else content
+            # Solo se guardan en caché las respuestas que se pudieron interpretar
+            if key is not None and result is not None:
+                self.cache.put(key, content)
+            return result
+        finally:
+            if bounded:
+                self.pending.release()
+
+    def _call(self, payload):
+        # Devuelve (contenido, usage de la respuesta, reintentos hechos)
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response_data = post_chat_completion(payload, self.api_key, session=self._session(),
+                                                     endpoint=self.endpoint, timeout=self.timeout)
+                content = extract_content(response_data)
+                return (content if content is not None else ANALYSIS_FAILED), response_data.get('usage'), attempt
+            except VisionAPIError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    self._report(e)
+                    return ANALYSIS_FAILED, None, attempt
+                delay = self._backoff(attempt, e.retry_after)
+                if e.status_code == 429:
+                    self.bucket.pause(delay)
+            except (requests.RequestException, ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                # Errores de red y respuestas 200 que no son JSON o no traen `choices` bien formados
+                if attempt == self.max_retries:
+                    self._report(e)
+                    return ANALYSIS_FAILED, None, attempt
+                delay = self._backoff(attempt)
+            time.sleep(delay)
+        return ANALYSIS_FAILED, None, self.max_retries
+
+    def _report(self, error):
+        self.errors.append(str(error))
+
+    def _cached(self, key, route=None, parse=None):
+        # Future ya resuelto si la caché tiene una respuesta utilizable para `key`
+        content = self.cache.get(key)
+        result = parse(content) if content is not None and parse is not None else content
+        if result is None:
+            return None
+        self.metrics.record_request('vision', route=route, cache_hit=True)
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def submit(self, payload, route=None, parse=None, bounded=True):
+        key = None
+        if self.cache is not None:
+            key = cache_key(payload)
+            future = self._cached(key, route, parse)
+            if future is not None:
+                return future
+        return self._dispatch(payload, key, route, parse, bounded)
+
+    def _dispatch(self, payload, key=None, route=None, parse=None, bounded=True):
+        if not bounded:
+            return self.executor.submit(self._run, payload, key, route, parse, False)
+        self.pending.acquire()
+        try:
+            return self.executor.submit(self._run, payload, key, route, parse)
+        except Exception:
+            self.pending.release()
+            raise
+
+    def submit_image(self, image_bytes, mime="image/png", detail=None):
+        return self.submit(image_payload(image_bytes, mime, detail), route='image')
+
+    def submit_batch(self, images, mime="image/png", detail=None):
+        """Envía varias imágenes en una sola solicitud y devuelve un Future por imagen.
+
+        La caché es por página (la clave de la imagen sola), así que un lote
+        con otros vecinos reutiliza lo ya analizado y solo envía las páginas
+        que faltan. Si la respuesta llega pero no se puede separar por imagen,
+        cada una se reenvía sola; si la solicitud falló, todas quedan fallidas.
+        """
+        keys = [cache_key(image_payload(image_bytes, mime, detail)) if self.cache is not None else None
+                for image_bytes in images]
+        page_futures = [self._cached(key, 'image') if key is not None else None for key in keys]
+        missing = [i for i, future in enumerate(page_futures) if future is None]
+        if len(missing) == 1:
+            i = missing[0]
+            page_futures[i] = self._dispatch(image_payload(images[i], mime, detail), keys[i], 'image')
+        if len(missing) <= 1:
+            return page_futures
+
+        for i in missing:
+            page_futures[i] = Future()
+        batch_future = self._dispatch(batch_image_payload([images[i] for i in missing], mime, detail), route='batch',
+                                      parse=lambda content: split_batch_response(content, len(missing)))
+
+        def distribute(future):
+            # Un callback que lanza una excepción la pierde y deja las páginas sin resolver
+            error = CancelledError() if future.cancelled() else future.exception()
+            if error is not None:
+                self._report(error)
+            analyses = ANALYSIS_FAILED if error is not None else future.result()
+            if analyses == ANALYSIS_FAILED:
+                # Reenviar página por página una solicitud que ya agotó sus reintentos solo multiplica la carga
+                for i in missing:
+                    page_futures[i].set_result(ANALYSIS_FAILED)
+                return
+            if analyses is not None:
+                for i, analysis in zip(missing, analyses):
+                    if keys[i] is not None:
+                        self.cache.put(keys[i], analysis)
+                    page_futures[i].set_result(analysis)
+                return
+            # Sin semáforo: este callback corre en un hilo del pool y no debe bloquearse
+            for i in missing:
+                try:
+                    single = self._dispatch(image_payload(images[i], mime, detail), keys[i], 'image', bounded=False)
+                except Exception as e:
+                    self._report(e)
+                    page_futures[i].set_result(ANALYSIS_FAILED)
+                    continue
+                single.add_done_callback(lambda f, target=page_futures[i]: resolve_page(target, f, self.errors))
+
+        batch_future.add_done_callback(distribute)
+        return page_futures
+
+    def submit_text(self, texts):
+        return self.submit(text_payload(texts), route='text')
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+class ImageBatcher:
+    """Agrupa páginas escaneadas en lotes de hasta `max_pages` imágenes.
+
+    El tamaño efectivo del lote se adapta al peso de las imágenes: se cierra
+    antes de superar `max_bytes`. `add` devuelve de inmediato un Future por
+    página, de modo que el llamador conserva el orden sin esperar el lote.
+    """
+
+    def __init__(self, engine, max_pages=4, max_bytes=1536 * 1024, mime="image/png", detail=None):
+        self.engine = engine
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.mime = mime
+        self.detail = detail
+        self.images = []
+        self.futures = []
+        self.size = 0
+        self.requests = 0
+
+    def add(self, image_bytes):
+        if self.images and (len(self.images) >= self.max_pages or self.size + len(image_bytes) > self.max_bytes):
+            self.flush()
+        future = Future()
+        self.images.append(image_bytes)
+        self.futures.append(future)
+        self.size += len(image_bytes)
+        return future
+
+    def flush(self):
+        if not self.images:
+            return
+        batch_futures = self.engine.submit_batch(self.images, self.mime, self.detail)
+        for batch_future, future in zip(batch_futures, self.futures):
+            batch_future.add_done_callback(lambda f, target=future: resolve_page(target, f, self.engine.errors))
+        self.requests += 1
+        self.images, self.futures, self.size = [], [], 0
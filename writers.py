@@ -0,0 +1,76 @@
+import io
+import math
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from slides import new_presentation, SlideTemplate
+
+
+def excel_value(value):
+    # openpyxl no acepta NaN ni tipos numpy en todos los casos
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class ExcelStreamWriter:
+    """Escribe filas en un .xlsx en modo write-only, sin mantener la hoja en memoria.
+
+    `path` puede ser una ruta o un buffer (por ejemplo un BytesIO para descargar).
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(self.columns)
+        self.rows = 0
+
+    def append(self, row):
+        self.append_values([row.get(column) for column in self.columns])
+
+    def append_values(self, values):
+        self.sheet.append([excel_value(value) for value in values])
+        self.rows += 1
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+def write_frame(df, target):
+    # Equivalente a df.to_excel(target, index=False), fila por fila en modo write-only
+    writer = ExcelStreamWriter(target, df.columns)
+    for values in df.itertuples(index=False, name=None):
+        writer.append_values(values)
+    writer.close()
+    return writer.rows
+
+
+def frame_to_xlsx_bytes(df):
+    buffer = io.BytesIO()
+    write_frame(df, buffer)
+    return buffer.getvalue()
+
+
+class DeckStreamWriter:
+    """Agrega una diapositiva por fila a medida que llegan las propuestas."""
+
+    def __init__(self, path):
+        self.path = path
+        self.prs = new_presentation()
+        self.template = SlideTemplate()
+        self.rows = 0
+
+    def append(self, row):
+        self.template.add_slide(self.prs, row)
+        self.rows += 1
+
+    def close(self):
+        self.prs.save(self.path)